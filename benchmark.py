@@ -0,0 +1,337 @@
+"""Offline benchmark and load test for plsnerfBot.
+
+Runs the real ServerMonitor, RateLimitQueue and PterodactylAPI against an in-process fake Pterodactyl panel
+and a stub Discord client that enforces Discord-like rate limits. Nothing leaves the machine.
+
+    python benchmark.py --servers 1000 --duration 120 --latency 0.05 --error-rate 0.01 --flap-rate 0.01
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import random
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+from aiohttp import web
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class FakePanel:
+    """In-process Pterodactyl panel with configurable latency, errors and flapping servers."""
+
+    def __init__(self, servers, latency, error_rate, flap_rate, flap_interval):
+        self.states = {server_id: "running" for server_id in servers.values()}
+        self.names = {server_id: server_name for server_name, server_id in servers.items()}
+        self.latency = latency
+        self.error_rate = error_rate
+        self.flap_rate = flap_rate
+        self.flap_interval = flap_interval
+        self.changed_at = {}  # server_name -> Zeitpunkt der letzten Zustandsänderung (noch nicht gemeldet)
+        self.requests = 0
+        self.errors = 0
+        self.runner = None
+
+    async def handle_resources(self, request):
+        self.requests += 1
+        await asyncio.sleep(random.expovariate(1 / self.latency) if self.latency else 0)
+        if random.random() < self.error_rate:
+            self.errors += 1
+            return web.json_response({"errors": [{"detail": "simulated error"}]}, status=500)
+        state = self.states.get(request.match_info["server_id"])
+        if state is None:
+            return web.json_response({"errors": [{"detail": "not found"}]}, status=404)
+        return web.json_response({"attributes": {"current_state": state}})
+
+    async def handle_list(self, request):
+        self.requests += 1
+        page = int(request.query.get("page", 1))
+        per_page = int(request.query.get("per_page", 50))
+        server_ids = list(self.states)
+        data = [{"attributes": {"identifier": server_id, "uuid": server_id, "status": None}}
+                for server_id in server_ids[(page - 1) * per_page:page * per_page]]
+        total_pages = max(1, -(-len(server_ids) // per_page))
+        return web.json_response({"data": data, "meta": {"pagination": {"total_pages": total_pages}}})
+
+    async def flap(self):
+        """Periodically switches a random share of servers between running and offline."""
+        while True:
+            await asyncio.sleep(self.flap_interval)
+            for server_id in random.sample(list(self.states), int(len(self.states) * self.flap_rate)):
+                self.states[server_id] = "offline" if self.states[server_id] == "running" else "running"
+                self.changed_at.setdefault(self.names[server_id], time.monotonic())
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/api/client/servers/{server_id}/resources", self.handle_resources)
+        app.router.add_get("/api/client", self.handle_list)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        return f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+
+class FakeRateLimited(Exception):
+    """Mimics `discord.RateLimited`."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"rate limited, retry after {retry_after:.2f}s")
+        self.retry_after = retry_after
+
+
+class FakeChannel:
+    """Text/voice channel stub enforcing Discord's per-channel limits (5 messages/5s, 2 renames/10min)."""
+
+    def __init__(self, channel_id, name, client):
+        self.id = channel_id
+        self.name = name
+        self.client = client
+        self.guild = SimpleNamespace(id=1)
+        self.sent = []
+        self.edits = []
+
+    def check_limit(self, history, max_requests, timeframe):
+        now = time.monotonic()
+        recent = [t for t in history if now - t < timeframe]
+        if len(recent) >= max_requests:
+            self.client.rate_limited += 1
+            raise FakeRateLimited(timeframe - (now - recent[0]))
+        history.append(now)
+
+    async def send(self, content=None, embed=None):
+        self.check_limit(self.sent, 5, 5)
+        self.client.record(content or embed.description)
+        return FakeMessage(self, embed)
+
+    async def edit(self, name):
+        self.check_limit(self.edits, 2, 600)
+        self.name = name
+        self.client.renames += 1
+
+    async def pins(self):
+        return []
+
+    async def fetch_message(self, message_id):
+        return self.client.messages[message_id]
+
+
+class FakeMessage:
+    """Message stub used for status boards."""
+
+    def __init__(self, channel, embed):
+        self.id = id(self)
+        self.channel = channel
+        self.embeds = [embed] if embed else []
+        channel.client.messages[self.id] = self
+
+    async def edit(self, embed):
+        self.channel.check_limit(self.channel.sent, 5, 5)
+        self.channel.client.record(embed.description)
+
+    async def pin(self):
+        pass
+
+
+class FakeDiscord:
+    """Stub for the DiscordBot instance used by ServerMonitor and NotificationBatcher."""
+
+    def __init__(self, panel):
+        self.panel = panel
+        self.channels = {}
+        self.messages = {}
+        self.closed = False
+        self.user = None
+        self.latencies = []
+        self.delivered = 0
+        self.renames = 0
+        self.rate_limited = 0
+
+    def record(self, text):
+        """Measures notification latency for every server mentioned in a delivered message."""
+        now = time.monotonic()
+        self.delivered += 1
+        for server_name, changed_at in list(self.panel.changed_at.items()):
+            if server_name in text:
+                self.latencies.append(now - changed_at)
+                del self.panel.changed_at[server_name]
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    async def send_discord_message(self, channel_id, message, embed=None):
+        await self.channels[channel_id].send(message, embed=embed)
+
+    async def wait_until_ready(self):
+        pass
+
+    def is_closed(self):
+        return self.closed
+
+    def add_listener(self, func, name=None):
+        pass
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def write_config(path, args, panel_url, servers, channels_per_server):
+    """Writes the config.json used by the bot modules during the benchmark."""
+    discord_channels = {}
+    server_mappings = {}
+    for index, server_name in enumerate(servers):
+        text_name = f"text-{index // channels_per_server}"
+        voice_name = f"voice-{server_name}"
+        discord_channels[text_name] = 100000 + index // channels_per_server
+        discord_channels[voice_name] = 200000 + index
+        server_mappings[server_name] = {"text_channel": text_name, "voice_channel": voice_name}
+
+    bench_config = {
+        "language": "en",
+        "pterodactyl_panel_url": panel_url,
+        "pterodactyl_api_key": "benchmark",
+        "monitor_interval": args.interval,
+        "api_max_concurrency": args.concurrency,
+        "bulk_status": args.bulk,
+        "state_file": os.path.join(path, "state.db"),
+        "log_level": "WARNING",
+        "discord_channels": discord_channels,
+        "servers": servers,
+        "server_mappings": server_mappings,
+    }
+    with open(os.path.join(path, "config.json"), "w") as file:
+        json.dump(bench_config, file)
+    return discord_channels
+
+
+async def run(args):
+    servers = {f"srv{index:05d}": f"id{index:05d}" for index in range(args.servers)}
+    panel = FakePanel(servers, args.latency, args.error_rate, args.flap_rate, args.flap_interval)
+    panel_url = await panel.start()
+
+    # Die Bot-Module lesen config.json und locales/ aus dem Arbeitsverzeichnis
+    workdir = tempfile.mkdtemp(prefix="plsnerfbot-bench-")
+    shutil.copytree(os.path.join(REPO_DIR, "locales"), os.path.join(workdir, "locales"))
+    discord_channels = write_config(workdir, args, panel_url, servers, args.servers_per_channel)
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_DIR)
+
+    tracemalloc.start()
+    logger_module = importlib.import_module("logger")
+    logger_module.configure_logging(log_level="WARNING")
+    server_monitor_module = importlib.import_module("server_monitor")
+    batcher_module = importlib.import_module("notification_batcher")
+    pterodactyl_api = importlib.import_module("pterodactyl_api").pterodactyl_api
+    monitor = server_monitor_module.server_monitor
+
+    fake_discord = FakeDiscord(panel)
+    for channel_name, channel_id in discord_channels.items():
+        fake_discord.channels[channel_id] = FakeChannel(channel_id, channel_name, fake_discord)
+    server_monitor_module.bot = fake_discord
+    batcher_module.bot = fake_discord
+
+    # ⏱️ Dauer jeder Abfragerunde messen
+    fetch_durations = []
+    polled = set()
+    coverage_time = None
+    poll_servers = monitor.poll_servers
+
+    async def timed_poll_servers(due_servers):
+        nonlocal coverage_time
+        start = time.monotonic()
+        statuses = await poll_servers(due_servers)
+        if due_servers:
+            fetch_durations.append(time.monotonic() - start)
+        polled.update(due_servers.values())
+        if coverage_time is None and len(polled) == len(servers):
+            coverage_time = time.monotonic() - started
+        return statuses
+
+    monitor.poll_servers = timed_poll_servers
+
+    backlog = {"text": [], "voice": []}
+
+    async def sample_backlog():
+        while True:
+            backlog["text"].append(monitor.text_rate_limiter.qsize())
+            backlog["voice"].append(monitor.voice_rate_limiter.qsize())
+            await asyncio.sleep(1)
+
+    started = time.monotonic()
+    tasks = [asyncio.create_task(monitor.check_servers()),
+             asyncio.create_task(sample_backlog()),
+             asyncio.create_task(panel.flap())]
+    await asyncio.sleep(args.duration)
+    fake_discord.closed = True
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    _, peak_memory = tracemalloc.get_traced_memory()
+    elapsed = time.monotonic() - started
+    report = {
+        "servers": args.servers,
+        "duration_s": round(elapsed, 1),
+        "panel_requests": panel.requests,
+        "panel_requests_per_s": round(panel.requests / elapsed, 1),
+        "panel_errors": panel.errors,
+        "full_coverage_s": round(coverage_time, 2) if coverage_time else None,
+        "fetch_round_p50_s": round(percentile(fetch_durations, 0.5), 3),
+        "fetch_round_p95_s": round(percentile(fetch_durations, 0.95), 3),
+        "fetch_round_max_s": round(max(fetch_durations, default=0), 3),
+        "notifications_delivered": fake_discord.delivered,
+        "voice_renames": fake_discord.renames,
+        "discord_rate_limited": fake_discord.rate_limited,
+        "notification_latency_p50_s": round(percentile(fake_discord.latencies, 0.5), 2),
+        "notification_latency_p95_s": round(percentile(fake_discord.latencies, 0.95), 2),
+        "undelivered_changes": len(panel.changed_at),
+        "text_backlog_max": max(backlog["text"], default=0),
+        "voice_backlog_max": max(backlog["voice"], default=0),
+        "voice_backlog_mean": round(statistics.mean(backlog["voice"]), 1) if backlog["voice"] else 0,
+        "python_heap_peak_mb": round(peak_memory / 2 ** 20, 1),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+    await pterodactyl_api.close()
+    await panel.runner.cleanup()
+    await importlib.import_module("state_store").state_store.close()
+    shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test with a fake panel and a stub Discord client.")
+    parser.add_argument("--servers", type=int, default=1000, help="number of simulated servers")
+    parser.add_argument("--duration", type=float, default=60, help="benchmark duration in seconds")
+    parser.add_argument("--interval", type=int, default=30, help="monitor_interval used by the bot")
+    parser.add_argument("--concurrency", type=int, default=20, help="api_max_concurrency used by the bot")
+    parser.add_argument("--latency", type=float, default=0.05, help="mean panel latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of panel requests that fail")
+    parser.add_argument("--flap-rate", type=float, default=0.01, help="share of servers flipping per flap interval")
+    parser.add_argument("--flap-interval", type=float, default=10, help="seconds between flaps")
+    parser.add_argument("--servers-per-channel", type=int, default=25, help="servers sharing one text channel")
+    parser.add_argument("--bulk", action="store_true", help="enable bulk_status")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report))
+    else:
+        for key, value in report.items():
+            print(f"{key:>28}: {value}")
+
+
+if __name__ == "__main__":
+    main()
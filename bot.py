@@ -1,9 +1,13 @@
 import asyncio
-from logger import logger
+import signal
+from logger import logger, configure_logging
 from discord_bot import bot
 from server_monitor import server_monitor
+from pterodactyl_api import pterodactyl_api
+from state_store import state_store
 from config import config
 from language import lang
+import metrics
 
 async def on_ready_task():
     """Sends the startup message in the selected language."""
@@ -13,17 +17,17 @@ async def on_ready_task():
     if first_channel_id:
         channel = bot.get_channel(first_channel_id)
         if channel:
-            await channel.send(lang.get("bot_started"))
+            await channel.send(lang.get("bot_started", lang.get_language(guild_id=channel.guild.id)))
+
+    # 🔄 Config-Datei und Sprachdateien auf Änderungen überwachen (mtime/inode, SIGHUP)
+    asyncio.create_task(config.watch())
+    asyncio.create_task(lang.watch())
 
     # 📡 Start server monitoring
     logger.info("📡 Starting server monitoring...")
+    # Abfrage, Änderungserkennung und Abgleich mit Discord laufen in einer gemeinsamen Schleife
     asyncio.create_task(server_monitor.check_servers())
 
-    # 🆕 Starte regelmäßige Status-Validierung
-    validation_interval = config.get("status_validation_interval", 300)  # Standard: 5 Minuten
-    logger.info(f"🔄 Starting periodic status validation (every {validation_interval} sec)...")
-    asyncio.create_task(server_monitor.validate_discord_status())
-
 @bot.event
 async def on_ready():
     """Called when the bot is ready."""
@@ -32,8 +36,26 @@ async def on_ready():
 
 async def main():
     """Starts the Discord bot."""
+    configure_logging(config.get("log_format", "text"), config.get("log_level", "INFO"),
+                      config.get("log_dedup_window", 60))
+    metrics_runner = await metrics.start_server()
+
+    # 🛑 systemd beendet mit SIGTERM: Bot sauber schließen, damit der Zustand unten gespeichert wird
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(bot.close()))
+    except (NotImplementedError, AttributeError):
+        pass  # Keine Signale auf dieser Plattform (z.B. Windows)
+
     async with bot:
-        await bot.start(config.get("discord_bot_token"))
+        try:
+            await bot.start(config.get("discord_bot_token"))
+        finally:
+            if metrics_runner:
+                await metrics_runner.cleanup()
+            await server_monitor.shard_pool.stop()
+            await server_monitor.listener.close()
+            await pterodactyl_api.close()
+            await state_store.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
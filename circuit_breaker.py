@@ -0,0 +1,88 @@
+import random
+import time
+from logger import logger
+from config import config
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}  # Für die Metriken
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while the circuit breaker of a panel is open."""
+
+
+class CircuitBreaker:
+    """Stops requests to an unreachable panel and lets a single probe request through after a backoff.
+
+    After `breaker_failure_threshold` consecutive failures the breaker opens for `breaker_reset_timeout` seconds.
+    Then one probe request is allowed (half-open): success closes the breaker, failure opens it again with a
+    doubled, jittered timeout (up to `breaker_max_reset_timeout`).
+    """
+
+    def __init__(self, name):
+        """
+        :param name: Name of the panel in logs and metrics
+        """
+        self.name = name
+        self.state = CLOSED
+        self.failures = 0
+        self.open_count = 0  # Wie oft der Breaker seit dem letzten Erfolg geöffnet wurde
+        self.open_until = 0
+        self.probe_in_flight = False
+
+    def before_request(self):
+        """Returns True if the request is the half-open probe, False for a normal request.
+
+        :raises CircuitOpenError: If no request may be sent right now
+        """
+        if self.state == CLOSED:
+            return False
+        if self.state == OPEN and time.monotonic() >= self.open_until:
+            self.state = HALF_OPEN
+            self.probe_in_flight = False
+        if self.state == HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True  # 🔍 Genau eine Probe-Anfrage durchlassen
+            return True
+        raise CircuitOpenError(f"Panel {self.name} is unavailable, request skipped")
+
+    def record_success(self, probe):
+        """Resets the failure count, and closes the breaker if the request was the half-open probe.
+
+        Late successes of requests started before the breaker opened do not close it.
+        """
+        if self.state == CLOSED:
+            self.failures = 0
+        elif probe and self.state == HALF_OPEN:
+            logger.info(f"✅ Panel {self.name} is reachable again, resuming requests.")
+            self.state = CLOSED
+            self.failures = 0
+            self.open_count = 0
+            self.probe_in_flight = False
+
+    def release_probe(self, probe):
+        """Allows a new probe after the probe ended without a result (e.g. it was cancelled)."""
+        if probe:
+            self.probe_in_flight = False
+
+    def record_failure(self, probe):
+        """Counts a failed request and opens the breaker when the threshold is reached or the probe failed."""
+        self.failures += 1
+        if self.state == CLOSED and self.failures >= config.get("breaker_failure_threshold", 5):
+            self.open()
+        elif probe and self.state == HALF_OPEN:
+            self.open()
+        # Sonst: Anfrage wurde vor dem Öffnen gestartet, der Breaker ist bereits offen
+
+    def open(self):
+        """Opens the breaker with an exponential, jittered backoff."""
+        timeout = min(config.get("breaker_max_reset_timeout", 300),
+                      config.get("breaker_reset_timeout", 10) * 2 ** self.open_count)
+        timeout *= random.uniform(0.8, 1.2)
+        logger.warning(f"🔌 Panel {self.name} unavailable after {self.failures} failed requests, "
+                       f"pausing requests for {timeout:.0f}s.")
+        self.state = OPEN
+        self.open_until = time.monotonic() + timeout
+        self.open_count += 1
+        self.probe_in_flight = False
@@ -1,32 +1,116 @@
+import asyncio
 import json
+import os
+import signal
+from types import MappingProxyType
 from logger import logger
 
 CONFIG_FILE = "config.json"
 
+
+def freeze(value):
+    """Recursively converts dicts and lists into read-only mappings and tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class ConfigSnapshot:
+    """Immutable view of one version of config.json with precomputed channel lookups."""
+
+    def __init__(self, data):
+        self.data = freeze(data)
+        self.text_channels = self.build_channel_map("text_channel")
+        self.voice_channels = self.build_channel_map("voice_channel")
+        self.voice_channel_servers = MappingProxyType(
+            {channel_id: server_name for server_name, channel_id in self.voice_channels.items()})
+
+    def build_channel_map(self, channel_type):
+        """Resolves the server -> channel name -> channel ID mapping once per snapshot."""
+        channels = self.data.get("discord_channels", {})
+        channel_map = {}
+        for server_name, mapping in self.data.get("server_mappings", {}).items():
+            if channel_type not in mapping:
+                continue
+            channel_id = channels.get(mapping[channel_type])
+            if channel_id:
+                channel_map[server_name] = channel_id
+            else:
+                logger.warning(f"⚠️ No valid {channel_type.replace('_', ' ')} ID found for server: {server_name}")
+        return MappingProxyType(channel_map)
+
+
 class Config:
     """Loads and manages the bot configuration from config.json dynamically."""
 
     def __init__(self):
-        self._config = self.load_config()
+        self.file_signature = None
+        self.subscribers = []
+        self.snapshot = ConfigSnapshot(self.load_config() or {})
         self.language = self.get("language", "en")  # Default: English
 
+    def get_file_signature(self):
+        """Returns (inode, mtime, size) of the config file, or None if it does not exist."""
+        try:
+            stat = os.stat(CONFIG_FILE)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
     def load_config(self):
-        """Loads the config file and handles errors."""
+        """Loads the config file and handles errors. Returns None if it cannot be loaded."""
+        self.file_signature = self.get_file_signature()
         try:
             with open(CONFIG_FILE, "r") as file:
                 return json.load(file)
         except (FileNotFoundError, json.JSONDecodeError) as e:
             logger.error(f"❌ Error loading config.json: {e}")
-            return {}
+            return None
 
-    def reload_config(self):
-        """🔄 Reloads the config file dynamically."""
-        self._config = self.load_config()
-        #logger.info("🔄 Config reloaded successfully!")
+    def reload_config(self, force=False):
+        """🔄 Reloads the config file if it changed on disk. Returns True if a new snapshot was applied."""
+        if not force and self.get_file_signature() == self.file_signature:
+            return False
+
+        data = self.load_config()
+        if data is None:
+            return False  # Fehlerhafte Datei: die bisherige Konfiguration bleibt aktiv
+
+        old_snapshot = self.snapshot
+        self.snapshot = ConfigSnapshot(data)
+        self.language = self.get("language", "en")
+
+        changed_keys = {key for key in set(old_snapshot.data) | set(self.snapshot.data)
+                        if old_snapshot.data.get(key) != self.snapshot.data.get(key)}
+        if changed_keys:
+            logger.info(f"🔄 Config reloaded, changed: {', '.join(sorted(changed_keys))}")
+            for callback in self.subscribers:
+                try:
+                    callback(changed_keys, self.snapshot)
+                except Exception as e:
+                    logger.error(f"❌ Error in config subscriber {callback}: {e}")
+        return True
+
+    def subscribe(self, callback):
+        """Registers callback(changed_keys, snapshot), called after every reload that changed something."""
+        self.subscribers.append(callback)
+
+    async def watch(self):
+        """Checks config.json for changes every `config_watch_interval` seconds and reloads on SIGHUP."""
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, self.reload_config, True)
+        except (NotImplementedError, AttributeError):
+            pass  # Keine Signale auf dieser Plattform (z.B. Windows)
+
+        while True:
+            await asyncio.sleep(self.get("config_watch_interval", 5))
+            self.reload_config()
 
     def get(self, key, default=None):
-        """Retrieves a value from the config dictionary."""
-        return self._config.get(key, default)
+        """Retrieves a value from the current config snapshot."""
+        return self.snapshot.data.get(key, default)
 
     def get_server_mappings(self):
         """Returns the server-to-channel mappings."""
@@ -38,25 +122,15 @@ class Config:
 
     def get_text_channel(self, server_name):
         """Returns the assigned text channel ID for a given server."""
-        mappings = self.get_server_mappings()
-        if server_name in mappings and "text_channel" in mappings[server_name]:
-            channel_name = mappings[server_name]["text_channel"]
-            channel_id = self.get("discord_channels", {}).get(channel_name)
-            if channel_id:
-                return channel_id
-            logger.warning(f"⚠️ No valid text channel ID found for server: {server_name}")
-        return None
+        return self.snapshot.text_channels.get(server_name)
 
     def get_voice_channel(self, server_name):
         """Returns the assigned voice channel ID for a given server."""
-        mappings = self.get_server_mappings()
-        if server_name in mappings and "voice_channel" in mappings[server_name]:
-            channel_name = mappings[server_name]["voice_channel"]
-            channel_id = self.get("discord_channels", {}).get(channel_name)
-            if channel_id:
-                return channel_id
-            logger.warning(f"⚠️ No valid voice channel ID found for server: {server_name}")
-        return None
+        return self.snapshot.voice_channels.get(server_name)
+
+    def get_voice_channel_server(self, channel_id):
+        """Returns the server whose status is shown in the given voice channel, or None."""
+        return self.snapshot.voice_channel_servers.get(channel_id)
 
 # Create a global instance
-config = Config()
\ No newline at end of file
+config = Config()
@@ -11,7 +11,10 @@ class DiscordBot(commands.Bot):
         intents = discord.Intents.default()
         intents.messages = True
         intents.guilds = True
-        super().__init__(command_prefix="!", intents=intents)
+        # Lange Discord-Rate-Limits als `discord.RateLimited` melden, statt im Request zu schlafen –
+        # so kann die RateLimitQueue andere Kanäle weiter bedienen
+        super().__init__(command_prefix="!", intents=intents,
+                         max_ratelimit_timeout=config.get("discord_max_ratelimit_timeout", 30))
 
     async def on_ready(self):
         """Called when the bot has successfully started."""
@@ -32,14 +35,14 @@ class DiscordBot(commands.Bot):
         else:
             logger.error("❌ Error: No valid channel ID found in the configuration!")
 
-    async def send_discord_message(self, channel_id, message):
-        """Sends a message to a Discord channel."""
+    async def send_discord_message(self, channel_id, message, embed=None):
+        """Sends a message (and/or an embed) to a Discord channel."""
         channel = self.get_channel(channel_id)
         if channel:
-            await channel.send(message)
-            logger.info(f"✅ Message sent: {message}")
+            await channel.send(message, embed=embed)
+            logger.debug(f"✅ Message sent: {message or embed.title}", extra={"channel": channel_id})
         else:
-            logger.error(f"❌ Could not find channel {channel_id}!")
+            logger.error(f"❌ Could not find channel {channel_id}!", extra={"channel": channel_id})
 
 
 bot = DiscordBot()
\ No newline at end of file
@@ -1,34 +1,136 @@
+import asyncio
 import json
 import os
+import string
 from logger import logger
 from config import config
 
+LOCALES_DIR = "locales"
+FALLBACK_LANGUAGE = "en"
+RENDER_CACHE_SIZE = 4096
+
+
+class Template:
+    """A translation string that is parsed once when its language file is loaded."""
+
+    __slots__ = ("text", "fields")
+
+    def __init__(self, text):
+        self.text = text
+        try:
+            self.fields = tuple(field for _, field, _, _ in string.Formatter().parse(text) if field is not None)
+        except ValueError as e:
+            logger.error(f"❌ Invalid placeholder in translation {text!r}: {e}")
+            self.text = text.replace("{", "{{").replace("}", "}}")  # Als reinen Text ausgeben
+            self.fields = ()
+
+    def render(self, kwargs):
+        """Fills in the placeholders; strings without placeholders are returned as they are."""
+        if not self.fields:
+            return self.text
+        try:
+            return self.text.format_map(kwargs)
+        except (KeyError, IndexError, ValueError) as e:
+            logger.warning(f"⚠️ Missing value {e} for translation {self.text!r}")
+            return self.text
+
 
 class LanguageManager:
-    """Loads and manages language files based on the configuration."""
+    """Loads and manages language files based on the configuration.
+
+    Every language is loaded on first use and its strings are precompiled into templates. Rendered strings
+    are memoized per (language, key, placeholders), and changed files in `locales/` are reloaded on the fly.
+    """
 
     def __init__(self):
-        self.language = config.get("language", "en")
-        self.translations = self.load_language_file()
+        self.catalogs = {}  # language -> {key: Template}
+        self.file_signatures = {}  # language -> (inode, mtime, size) der geladenen Datei
+        self.rendered = {}  # (language, key, placeholders) -> fertiger Text
+        self.get_catalog(FALLBACK_LANGUAGE)
 
-    def load_language_file(self):
-        """Loads the language file based on the configuration."""
-        lang_file = f"locales/{self.language}.json"
-        if not os.path.exists(lang_file):
-            logger.warning(f"⚠️ Language file {lang_file} not found! Falling back to English.")
-            lang_file = "locales/en.json"
+    @staticmethod
+    def get_language_file(language):
+        return os.path.join(LOCALES_DIR, f"{language}.json")
 
+    @staticmethod
+    def get_file_signature(lang_file):
+        """Returns (inode, mtime, size) of a language file, or None if it does not exist."""
+        try:
+            stat = os.stat(lang_file)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def load_language_file(self, language):
+        """Loads and precompiles a language file. Returns None if it cannot be loaded."""
+        lang_file = self.get_language_file(language)
+        self.file_signatures[language] = self.get_file_signature(lang_file)
         try:
             with open(lang_file, "r", encoding="utf-8") as file:
-                return json.load(file)
-        except (FileNotFoundError, json.JSONDecodeError) as e:
-            logger.error(f"❌ Error loading language file: {e}")
-            return {}
+                return {key: Template(text) for key, text in json.load(file).items()}
+        except FileNotFoundError:
+            logger.warning(f"⚠️ Language file {lang_file} not found! Falling back to English.")
+        except (json.JSONDecodeError, AttributeError) as e:
+            logger.error(f"❌ Error loading language file {lang_file}: {e}")
+        return None
+
+    def get_catalog(self, language):
+        """Returns the precompiled strings of a language, loading them on first use."""
+        catalog = self.catalogs.get(language)
+        if catalog is None:
+            catalog = self.catalogs[language] = self.load_language_file(language) or {}
+        return catalog
+
+    def reload_changed(self):
+        """🔄 Reloads every loaded language file that changed on disk. Returns True if one was reloaded."""
+        changed = [language for language, signature in self.file_signatures.items()
+                   if self.get_file_signature(self.get_language_file(language)) != signature]
+        for language in changed:
+            catalog = self.load_language_file(language)
+            if catalog is not None or language not in self.catalogs:
+                self.catalogs[language] = catalog or {}
+            logger.info(f"🔄 Language file {self.get_language_file(language)} reloaded.")
+        if changed:
+            self.rendered.clear()
+        return bool(changed)
 
-    def get(self, key, **kwargs):
+    async def watch(self):
+        """Checks the loaded language files for changes every `config_watch_interval` seconds."""
+        while True:
+            await asyncio.sleep(config.get("config_watch_interval", 5))
+            self.reload_changed()
+
+    def get_language(self, server_name=None, guild_id=None):
+        """Returns the language for a server or guild.
+
+        A `language` in the server's `server_mappings` entry wins over `guild_languages`, which wins over the
+        global `language`.
+        """
+        if server_name is not None:
+            language = config.get("server_mappings", {}).get(server_name, {}).get("language")
+            if language:
+                return language
+        if guild_id is not None:
+            language = config.get("guild_languages", {}).get(str(guild_id))
+            if language:
+                return language
+        return config.get("language", FALLBACK_LANGUAGE)
+
+    def get(self, key, language=None, **kwargs):
         """Returns a translated string, supporting placeholders."""
-        text = self.translations.get(key, key)  # Fallback to key if not found
-        return text.format(**kwargs) if kwargs else text
+        language = language or config.get("language", FALLBACK_LANGUAGE)
+        cache_key = (language, key, tuple(kwargs.items()))
+        text = self.rendered.get(cache_key)
+        if text is not None:
+            return text
+
+        template = self.get_catalog(language).get(key) or self.get_catalog(FALLBACK_LANGUAGE).get(key)
+        text = template.render(kwargs) if template else key  # Fallback to key if not found
+
+        if len(self.rendered) >= RENDER_CACHE_SIZE:
+            del self.rendered[next(iter(self.rendered))]  # Ältesten Eintrag verwerfen
+        self.rendered[cache_key] = text
+        return text
 
 # Create a global instance
 lang = LanguageManager()
@@ -1,19 +1,112 @@
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import os
+import queue
 import sys
+import time
+
+class JsonFormatter(logging.Formatter):
+    """Formats log records as single-line JSON objects, including `server`/`channel` extras."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        for field in ("server", "channel"):
+            if hasattr(record, field):
+                entry[field] = getattr(record, field)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+class TracebackQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that keeps the traceback in `exc_text` instead of folding it into the message.
+
+    The standard QueueHandler formats the traceback into `msg`, so the JSON output could never have an
+    `exception` field. The traceback is still rendered here, in the logging thread, while it is available.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None  # Keine Frames an den Listener-Thread weiterreichen
+        return record
+
+class RepeatFilter(logging.Filter):
+    """Suppresses identical warnings within a time window and reports how many were dropped."""
+
+    def __init__(self, window=60, min_level=logging.WARNING):
+        super().__init__()
+        self.window = window
+        self.min_level = min_level
+        self.seen = {}  # (level, message) -> [zuerst ausgegeben, Anzahl unterdrückt]
+
+    def filter(self, record):
+        if record.levelno < self.min_level or self.window <= 0:
+            return True
+
+        now = time.monotonic()
+        key = (record.levelno, record.getMessage())
+        entry = self.seen.get(key)
+        if entry and now - entry[0] < self.window:
+            entry[1] += 1
+            return False
+
+        if entry and entry[1]:
+            record.msg = f"{record.getMessage()} (suppressed {entry[1]} similar messages)"
+            record.args = None
+        self.seen[key] = [now, 0]
+
+        # Alte Einträge gelegentlich aufräumen, damit der Filter nicht unbegrenzt wächst
+        if len(self.seen) > 1000:
+            self.seen = {k: v for k, v in self.seen.items() if now - v[0] < self.window}
+        return True
 
 def setup_logger():
-    """Configures logging to be used globally, ensuring journalctl compatibility."""
+    """Configures logging to be used globally, ensuring journalctl compatibility.
+
+    Records are handed to a queue in the event loop thread and written to stdout by a background listener,
+    so slow journald I/O does not block the bot.
+    """
     logger = logging.getLogger()
     logger.setLevel(logging.INFO)
 
     formatter = logging.Formatter("%(asctime)s [%(levelname)s]: %(message)s")
 
-    # Console handler for systemd logs
-    console_handler = logging.StreamHandler(sys.stdout)
+    # Console handler for systemd logs (Shard-Worker loggen nach stderr, ihr stdout gehört den Status-Deltas)
+    stream = sys.stderr if os.environ.get("PLSNERFBOT_LOG_STREAM") == "stderr" else sys.stdout
+    console_handler = logging.StreamHandler(stream)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
 
-setup_logger()
+    log_queue = queue.SimpleQueue()
+    queue_handler = TracebackQueueHandler(log_queue)
+    queue_handler.addFilter(repeat_filter)
+    logger.addHandler(queue_handler)
+
+    listener = logging.handlers.QueueListener(log_queue, console_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    return console_handler
+
+def configure_logging(log_format="text", log_level="INFO", dedup_window=60):
+    """Applies the logging settings from config.json (called once the config is loaded)."""
+    logging.getLogger().setLevel(log_level.upper())
+    repeat_filter.window = dedup_window
+    if log_format == "json":
+        console_handler.setFormatter(JsonFormatter())
+
+repeat_filter = RepeatFilter()
+console_handler = setup_logger()
 
 # Export the global logger instance
 logger = logging.getLogger(__name__)  # Holt den Logger einmal für das ganze Projekt
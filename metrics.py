@@ -0,0 +1,136 @@
+import bisect
+from aiohttp import web
+from logger import logger
+from config import config
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def format_labels(labelnames, values, extra=()):
+    """Formats label names and values as a Prometheus label set, e.g. {queue="voice"}."""
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Metric:
+    """Base class for a metric family with optional labels."""
+
+    type = "untyped"
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        """
+        :param callback: Optional function returning {label_values: value}, evaluated on every scrape
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self.values = {}  # label_values -> Wert
+        registry.append(self)
+
+    def collect(self):
+        """Returns the exposition lines of this metric."""
+        values = self.callback() if self.callback else self.values
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for label_values, value in values.items():
+            lines.append(f"{self.name}{format_labels(self.labelnames, label_values)} {value}")
+        return lines
+
+
+class Counter(Metric):
+    """Monotonically increasing value."""
+
+    type = "counter"
+
+    def inc(self, *label_values, amount=1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+
+class Gauge(Metric):
+    """Value that can go up and down."""
+
+    type = "gauge"
+
+    def set(self, value, *label_values):
+        self.values[label_values] = value
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets."""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *label_values):
+        counts, total = self.values.get(label_values, ([0] * (len(self.buckets) + 1), 0))
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.values[label_values] = (counts, total + value)
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for label_values, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else bound
+                lines.append(f"{self.name}_bucket{format_labels(self.labelnames, label_values, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, label_values)} {total}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, label_values)} {cumulative}")
+        return lines
+
+
+registry = []
+
+
+def render():
+    """Renders all registered metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in registry:
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+
+async def handle_metrics(request):
+    return web.Response(text=render(), content_type="text/plain", charset="utf-8",
+                        headers={"Cache-Control": "no-cache"})
+
+
+async def start_server():
+    """Starts the local /metrics HTTP endpoint if `metrics_port` is configured. Returns the runner or None."""
+    port = config.get("metrics_port")
+    if not port:
+        return None
+
+    host = config.get("metrics_host", "127.0.0.1")
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"📈 Metrics available at http://{host}:{port}/metrics")
+    return runner
+
+
+# 📈 Gemeinsame Metriken der Module
+panel_requests = Counter(
+    "plsnerfbot_panel_requests_total", "Requests sent to the Pterodactyl panel.", ["endpoint", "result"])
+panel_fetch_seconds = Histogram(
+    "plsnerfbot_panel_fetch_seconds", "Latency of Pterodactyl panel requests.", ["endpoint"])
+poll_cycle_seconds = Histogram(
+    "plsnerfbot_poll_cycle_seconds", "Duration of a poll tick (fetch and reconciliation).")
+polled_servers = Counter(
+    "plsnerfbot_polled_servers_total", "Server status lookups made by the poller.")
+status_transitions = Counter(
+    "plsnerfbot_status_transitions_total", "Observed server status transitions.", ["from_status", "to_status"])
+dispatch_seconds = Histogram(
+    "plsnerfbot_dispatch_seconds", "Duration of queued Discord actions.", ["queue"])
+ratelimit_wait_seconds = Counter(
+    "plsnerfbot_ratelimit_wait_seconds_total", "Time spent waiting for rate limits.", ["queue"])
+ratelimit_hits = Counter(
+    "plsnerfbot_ratelimit_hits_total", "Rate limits reported by Discord.", ["queue"])
@@ -0,0 +1,210 @@
+import asyncio
+import discord
+from discord_bot import bot
+from config import config
+from language import lang
+from logger import logger
+from state_store import state_store
+
+EMBED_DESCRIPTION_LIMIT = 4096
+
+
+class NotificationBatcher:
+    """Collects status messages per text channel for a short window and sends them as one message.
+
+    A single change is sent as a normal message, several changes as one embed. If more servers change at
+    once than `status_board_threshold`, a pinned status board message is edited in place instead. Once a
+    channel has a status board, it is kept up to date with every later change as well.
+    Callers can pass `on_delivered(delivered)` to learn whether their message actually reached Discord.
+    """
+
+    def __init__(self, rate_limiter):
+        """
+        :param rate_limiter: RateLimitQueue used to send messages (routed per channel)
+        """
+        self.rate_limiter = rate_limiter
+        self.pending = {}  # channel_id -> {server_name: (message, on_delivered)}, gesammelt im aktuellen Fenster
+        self.board_callbacks = {}  # channel_id -> on_delivered-Callbacks, die auf das nächste Statusboard-Update warten
+        self.flush_tasks = {}  # channel_id -> Task, der das Fenster abschließt
+        self.board_state = state_store.mapping("board_state")  # channel_id -> {server_name: message}
+        self.status_boards = state_store.mapping("status_boards")  # channel_id -> ID der Statusboard-Nachricht
+
+        # 🧹 Entfernte, umbenannte oder in andere Kanäle verschobene Server vom Statusboard nehmen
+        self.prune_board_state(config.snapshot.text_channels)
+        config.subscribe(self.on_config_change)
+
+    def on_config_change(self, changed_keys, snapshot):
+        """Prunes the status boards when servers or their text channels changed."""
+        if not changed_keys & {"servers", "server_mappings", "discord_channels"}:
+            return
+        for channel_id in self.prune_board_state(snapshot.text_channels):
+            if channel_id in self.status_boards:
+                asyncio.create_task(self.queue_board_update(channel_id))
+
+    def prune_board_state(self, text_channels):
+        """Removes board entries of servers that are no longer shown in that channel. Returns the changed channels.
+
+        :param text_channels: Current server name -> text channel ID mapping
+        """
+        changed = []
+        for channel_id, entries in list(self.board_state.items()):
+            kept = {server_name: message for server_name, message in entries.items()
+                    if text_channels.get(server_name) == channel_id}
+            if kept == entries:
+                continue
+            changed.append(channel_id)
+            if kept:
+                self.board_state[channel_id] = kept
+            else:
+                del self.board_state[channel_id]
+        return changed
+
+    async def add(self, channel_id, server_name, message, on_delivered=None):
+        """Adds a status message; it is sent when the channel's batching window closes.
+
+        :param on_delivered: Called as on_delivered(True) once the message was sent, on_delivered(False) if
+            sending failed for good. Not called if a newer message for the same server replaces it.
+        """
+        self.pending.setdefault(channel_id, {})[server_name] = (message, on_delivered)  # Neuester Stand pro Server gewinnt
+        self.board_state[channel_id] = {**self.board_state.get(channel_id, {}), server_name: message}
+
+        if channel_id not in self.flush_tasks:
+            self.flush_tasks[channel_id] = asyncio.create_task(self.flush_later(channel_id))
+
+    async def flush_later(self, channel_id):
+        """Waits for the batching window and then flushes the channel."""
+        try:
+            await asyncio.sleep(config.get("digest_window", 5))
+        finally:
+            self.flush_tasks.pop(channel_id, None)
+        await self.flush(channel_id)
+
+    async def flush(self, channel_id):
+        """Sends all collected messages of a channel as a single message, embed or status board update."""
+        pending = self.pending.pop(channel_id, None)
+        if not pending:
+            return
+        messages = {server_name: message for server_name, (message, _) in pending.items()}
+        callbacks = [on_delivered for _, on_delivered in pending.values() if on_delivered]
+
+        if len(messages) > config.get("status_board_threshold", 10):
+            logger.info(f"📊 {len(messages)} status changes for channel {channel_id}, updating status board.",
+                        extra={"channel": channel_id})
+            await self.queue_board_update(channel_id, callbacks)
+            return
+
+        if len(messages) == 1:
+            message, embed = next(iter(messages.values())), None
+        else:
+            message = None
+            language = self.get_language(channel_id)
+            embed = self.build_embed(lang.get("digest_title", language, count=len(messages)), messages.values(), language)
+
+        async def send_message():
+            try:
+                await bot.send_discord_message(channel_id, message, embed=embed)
+                logger.debug(f"✅ Status update sent to channel {channel_id} ({len(messages)} servers)",
+                             extra={"channel": channel_id})
+            except Exception as e:
+                logger.error(f"❌ Failed to send status update to channel {channel_id}: {e}", extra={"channel": channel_id})
+                if self.rate_limiter.get_rate_limit(e) is None:
+                    self.notify(callbacks, False)  # Wird von der Queue verworfen, nicht wiederholt
+                raise  # Die Queue erkennt Rate-Limits und wiederholt den Task
+            self.notify(callbacks, True)
+
+        await self.rate_limiter.add_task(send_message, route=channel_id)
+
+        # 📊 Ein vorhandenes Statusboard auch bei einzelnen Änderungen aktuell halten
+        if channel_id in self.status_boards:
+            await self.queue_board_update(channel_id)
+
+    async def queue_board_update(self, channel_id, callbacks=()):
+        """Queues an update of the channel's status board; a newer update replaces a waiting one."""
+        # Ein neueres Board-Update ersetzt das wartende, daher die Callbacks pro Kanal sammeln
+        self.board_callbacks.setdefault(channel_id, []).extend(callbacks)
+
+        async def send_board():
+            try:
+                await self.update_status_board(channel_id)
+            except Exception as e:
+                if self.rate_limiter.get_rate_limit(e) is None:
+                    self.notify(self.board_callbacks.pop(channel_id, []), False)
+                raise
+            self.notify(self.board_callbacks.pop(channel_id, []), True)
+
+        await self.rate_limiter.add_task(send_board, key=("board", channel_id), route=channel_id)
+
+    @staticmethod
+    def notify(callbacks, delivered):
+        """Reports the outcome of a send to the callers of add()."""
+        for on_delivered in callbacks:
+            try:
+                on_delivered(delivered)
+            except Exception as e:
+                logger.error(f"❌ Error in delivery callback {on_delivered}: {e}")
+
+    @staticmethod
+    def get_language(channel_id):
+        """Returns the language of a channel's guild."""
+        channel = bot.get_channel(channel_id)
+        return lang.get_language(guild_id=channel.guild.id if channel else None)
+
+    def build_embed(self, title, lines, language=None):
+        """Builds an embed from status lines, truncating it to Discord's description limit."""
+        lines = list(lines)
+        # Platz für den "… und N weitere"-Hinweis reservieren (die größte Zahl ist der längste Text)
+        reserve = len(lang.get("digest_more", language, count=len(lines))) + 2
+        parts = []
+        length = 0
+        for index, line in enumerate(lines):
+            if length + len(line) + reserve > EMBED_DESCRIPTION_LIMIT:
+                parts.append(lang.get("digest_more", language, count=len(lines) - index))
+                break
+            parts.append(line + "\n")
+            length += len(line) + 1
+        return discord.Embed(title=title, description="".join(parts))
+
+    async def update_status_board(self, channel_id):
+        """Edits the status board message of a channel, creating and pinning it if necessary."""
+        channel = bot.get_channel(channel_id)
+        if not channel:
+            logger.error(f"❌ Could not find channel {channel_id}!", extra={"channel": channel_id})
+            return
+
+        language = lang.get_language(guild_id=channel.guild.id)
+        title = lang.get("status_board_title", language)
+        embed = self.build_embed(title, self.board_state.get(channel_id, {}).values(), language)
+
+        try:
+            board_message = await self.find_status_board(channel, title)
+            if board_message:
+                await board_message.edit(embed=embed)
+                logger.debug(f"✅ Status board updated in channel {channel_id}", extra={"channel": channel_id})
+                return
+
+            board_message = await channel.send(embed=embed)
+        except Exception as e:
+            logger.error(f"❌ Failed to update status board in channel {channel_id}: {e}", extra={"channel": channel_id})
+            raise  # Die Queue erkennt Rate-Limits und wiederholt den Task
+
+        self.status_boards[channel_id] = board_message.id
+        try:
+            await board_message.pin()
+        except discord.HTTPException as e:
+            logger.warning(f"⚠️ Could not pin status board in channel {channel_id}: {e}", extra={"channel": channel_id})
+        logger.info(f"✅ Status board created in channel {channel_id}", extra={"channel": channel_id})
+
+    async def find_status_board(self, channel, title):
+        """Returns the existing status board message of a channel (known ID or bot-authored pin), or None."""
+        message_id = self.status_boards.get(channel.id)
+        if message_id:
+            try:
+                return await channel.fetch_message(message_id)
+            except discord.NotFound:
+                self.status_boards.pop(channel.id, None)
+
+        for message in await channel.pins():
+            if message.author == bot.user and message.embeds and message.embeds[0].title == title:
+                self.status_boards[channel.id] = message.id
+                return message
+        return None
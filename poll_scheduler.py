@@ -0,0 +1,65 @@
+import random
+from config import config
+
+TRANSITION_STATES = ("starting", "stopping")
+
+
+class PollScheduler:
+    """Spreads server polls across the monitor interval and adapts each server's poll rate to its state."""
+
+    def __init__(self):
+        self.next_poll = {}  # server_id -> Zeitpunkt der nächsten Abfrage (monotonic)
+        self.last_seen = {}  # server_id -> zuletzt gesehener Status
+        self.stable_since = {}  # server_id -> seit wann der Status unverändert ist
+
+    def get_interval(self, server_id, status, now):
+        """Returns the poll interval for a server based on its current and past state."""
+        base_interval = config.get("monitor_interval", 60)
+
+        # 🔄 Server im Übergang werden schneller abgefragt
+        if status in TRANSITION_STATES:
+            return min(base_interval, config.get("transition_poll_interval", 5))
+
+        # 💤 Lange stabile Server werden schrittweise seltener abgefragt (Verdopplung pro Stabilitätsphase)
+        stable_after = config.get("stable_backoff_after", base_interval * 10)
+        max_interval = config.get("max_poll_interval", base_interval * 4)
+        stable_for = now - self.stable_since.get(server_id, now)
+        if stable_after > 0 and stable_for >= stable_after:
+            return min(max_interval, base_interval * 2 ** int(stable_for // stable_after))
+
+        return base_interval
+
+    def schedule(self, server_id, status, now):
+        """Records a poll result and plans the next poll with random jitter."""
+        if self.last_seen.get(server_id) != status:
+            self.last_seen[server_id] = status
+            self.stable_since[server_id] = now
+
+        jitter = config.get("poll_jitter", 0.1)
+        interval = self.get_interval(server_id, status, now)
+        self.next_poll[server_id] = now + interval * random.uniform(1 - jitter, 1 + jitter)
+
+    def get_due(self, server_ids, now):
+        """Returns the servers whose next poll is due. New servers get a random offset within the interval."""
+        base_interval = config.get("monitor_interval", 60)
+        due = []
+        for server_id in server_ids:
+            if server_id not in self.next_poll:
+                # Erste Abfrage gleichmäßig über das Intervall verteilen, statt alle gleichzeitig
+                self.next_poll[server_id] = now + random.uniform(0, base_interval)
+            if self.next_poll[server_id] <= now:
+                due.append(server_id)
+        return due
+
+    def time_until_next(self, now):
+        """Returns the number of seconds until the next scheduled poll."""
+        if not self.next_poll:
+            return config.get("monitor_interval", 60)
+        return max(0, min(self.next_poll.values()) - now)
+
+    def forget(self, server_ids):
+        """Removes servers that are no longer configured."""
+        for server_id in server_ids:
+            self.next_poll.pop(server_id, None)
+            self.last_seen.pop(server_id, None)
+            self.stable_since.pop(server_id, None)
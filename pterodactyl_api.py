@@ -1,35 +1,335 @@
+import asyncio
 import time
-import requests
+import aiohttp
 from logger import logger
 from config import config
+from ttl_cache import TTLCache
+from resource_history import ResourceHistory
+from circuit_breaker import CircuitBreaker, CircuitOpenError, STATE_VALUES
+import metrics
 
 
 class PterodactylAPI:
-    """Handles Pterodactyl API requests while caching server status to prevent unnecessary API calls."""
-
-    def __init__(self):
-        self.api_url = config.get("pterodactyl_panel_url")
-        self.api_key = config.get("pterodactyl_api_key")
-        self.cache = {}  # Stores last known status
-        self.cache_time = {}
-
-    def get_server_status(self, server_id):
-        """Fetches the server status from Pterodactyl API while caching the response."""
-        current_time = time.time()
-        cache_expiry = config.get("monitor_interval", 60)
-        if server_id in self.cache and (current_time - self.cache_time.get(server_id, 0)) < cache_expiry:
-            return self.cache[server_id]  # Use cached result if less than 60s old
-
-        headers = {"Authorization": f"Bearer {self.api_key}", "Accept": "application/json"}
-        response = requests.get(f"{self.api_url}/api/client/servers/{server_id}/resources", headers=headers)
-
-        if response.status_code == 200:
-            status = response.json()["attributes"]["current_state"]
-            self.cache[server_id] = status
-            self.cache_time[server_id] = current_time
-            return status
-
-        logger.error(f"⚠️ Error fetching server status for {server_id}: {response.text}")
-        return "unknown"
-
-pterodactyl_api = PterodactylAPI()
\ No newline at end of file
+    """Handles Pterodactyl API requests while caching server status to prevent unnecessary API calls.
+
+    Server IDs of the form "<panel>:<id>" are routed to a client for the panel of that name from `panels`,
+    plain IDs use the default panel (`pterodactyl_panel_url` / `pterodactyl_api_key`).
+    """
+
+    def __init__(self, panel=None, api_url=None, api_key=None, resource_history=None):
+        """
+        :param panel: Name of the panel for additional panel clients (None for the default client)
+        :param resource_history: ResourceHistory shared with the default client (for additional panel clients)
+        """
+        self.panel = panel
+        self.api_url = api_url if panel else config.get("pterodactyl_panel_url")
+        self.api_key = api_key if panel else config.get("pterodactyl_api_key")
+        self.panel_clients = {}  # panel name -> PterodactylAPI
+        # 🗃️ Letzter bekannter Status pro Server; Fehler werden kurz negativ gecacht, parallele Abfragen zusammengelegt
+        self.cache = TTLCache(
+            max_size=config.get("cache_max_size", 2048),
+            error_ttl=config.get("cache_error_ttl", 15),
+        )
+
+        # 🔌 Gemeinsamer Connection-Pool (Keep-Alive) statt einer neuen TCP/TLS-Verbindung pro Abfrage
+        self.timeout = config.get("api_timeout", 10)
+        self.max_concurrency = config.get("api_max_concurrency", 20)
+        self.session = None
+        self.semaphore = None
+        # 🔌 Bei Panel-Ausfällen keine Anfragen mehr senden, bis eine Probe-Anfrage wieder erfolgreich ist
+        self.breaker = CircuitBreaker(panel or "default")
+
+        # 📋 Server-Liste aus /api/client (Installations-/Sperrstatus, Limits), identifier/uuid -> attributes
+        self.server_info = {}
+        self.server_info_time = 0
+
+        # 📈 CPU-, RAM-, Disk- und Netzwerkverbrauch aus /resources, pro Server in einem Ringpuffer
+        self.resource_history = resource_history or ResourceHistory(
+            size=config.get("resource_history_size", 120),
+            min_interval=config.get("resource_sample_interval", 5),
+        )
+
+        if panel:
+            return  # Zusätzliche Panel-Clients werden vom Standard-Client verwaltet
+
+        config.subscribe(self.on_config_change)
+
+        metrics.Counter("plsnerfbot_cache_events_total", "Status cache lookups by outcome.", ["event"],
+                        callback=lambda: {(event,): count for event, count in self.get_cache_stats().items()
+                                          if event != "size"})
+        metrics.Gauge("plsnerfbot_cache_entries", "Entries in the status cache.",
+                      callback=lambda: {(): self.get_cache_stats()["size"]})
+        metrics.Gauge("plsnerfbot_panel_circuit_state", "Circuit breaker state per panel (0 closed, 1 half-open, 2 open).",
+                      ["panel"], callback=lambda: {(client.breaker.name,): STATE_VALUES[client.breaker.state]
+                                                   for client in (self, *self.panel_clients.values())})
+
+    def on_config_change(self, changed_keys, snapshot):
+        """Applies changed panel credentials from a reloaded config."""
+        if "panels" in changed_keys:
+            for client in self.panel_clients.values():
+                asyncio.create_task(client.close())
+            self.panel_clients = {}  # Beim nächsten Zugriff mit den neuen Zugangsdaten neu anlegen
+
+        if changed_keys & {"pterodactyl_panel_url", "pterodactyl_api_key"}:
+            self.api_url = snapshot.data.get("pterodactyl_panel_url")
+            self.api_key = snapshot.data.get("pterodactyl_api_key")
+            if self.session and not self.session.closed:
+                # Die Session trägt den API-Key im Header – beim nächsten Zugriff neu aufbauen
+                asyncio.create_task(self.session.close())
+                self.session = None
+
+    def get_session(self):
+        """Returns the shared aiohttp session, creating it inside the running event loop on first use."""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60)
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"Authorization": f"Bearer {self.api_key}", "Accept": "application/json"},
+            )
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self.session
+
+    async def close(self):
+        """Closes the shared session and its pooled connections."""
+        for client in self.panel_clients.values():
+            await client.close()
+        if self.session and not self.session.closed:
+            await self.session.close()
+
+    def get_client(self, server_id):
+        """Returns the client responsible for a server ID and the ID as known to that panel."""
+        panel, separator, panel_server_id = server_id.rpartition(":")
+        if not separator:
+            return self, server_id
+
+        client = self.panel_clients.get(panel)
+        if client is None:
+            panel_config = config.get("panels", {}).get(panel)
+            if not panel_config:
+                raise KeyError(f"Unknown panel '{panel}' for server {server_id}")
+            client = self.panel_clients[panel] = PterodactylAPI(
+                panel=panel, api_url=panel_config.get("url"), api_key=panel_config.get("api_key"),
+                resource_history=self.resource_history)
+        return client, panel_server_id
+
+    def get_server_key(self, panel_server_id):
+        """Returns the server ID as listed in `servers` for an ID known to this panel."""
+        return f"{self.panel}:{panel_server_id}" if self.panel else panel_server_id
+
+    async def get_server_status(self, server_id):
+        """Returns the server status from the Pterodactyl API, "unknown" on errors.
+
+        Concurrent lookups of the same server share one request, failed lookups are retried after `cache_error_ttl`.
+        """
+        try:
+            client, panel_server_id = self.get_client(server_id)
+        except KeyError as e:
+            logger.error(f"⚠️ {e.args[0]}")
+            return "unknown"
+        if client is not self:
+            return await client.get_server_status(panel_server_id)
+
+        try:
+            return await self.cache.get(server_id, lambda: self.fetch_server_status(server_id))
+        except (CircuitOpenError, aiohttp.ClientError, asyncio.TimeoutError, KeyError, TypeError, ValueError):
+            # In request_json bzw. fetch_server_status geloggt, ein offener Breaker einmal beim Öffnen
+            return "unknown"
+        except Exception:
+            logger.exception(f"❌ Unexpected error fetching server status for {server_id}")
+            return "unknown"
+
+    async def get_statuses(self, server_ids):
+        """Fetches the status of many servers concurrently and returns a {server_id: status} dict."""
+        # Die Parallelität wird durch `api_max_concurrency` pro Panel begrenzt
+        server_ids = list(server_ids)
+        if config.get("bulk_status", False):
+            return await self.get_fleet_status(server_ids)
+
+        statuses = await asyncio.gather(*(self.get_server_status(server_id) for server_id in server_ids))
+        return dict(zip(server_ids, statuses))
+
+    async def request_json(self, endpoint, path, params=None):
+        """Sends a GET request to the panel and returns the JSON body, recording latency and result metrics.
+
+        Connection errors, timeouts, 5xx and 429 responses count as panel failures for the circuit breaker,
+        2xx/3xx responses as successes. Other 4xx responses (e.g. a deleted server) count as neither.
+
+        :param endpoint: Short name of the endpoint used as metric label (e.g. "resources")
+        :raises CircuitOpenError: If the panel is considered down and the request was not sent
+        """
+        session = self.get_session()
+        start = time.monotonic()
+        result = "error"
+        try:
+            async with self.semaphore:
+                probe = self.breaker.before_request()  # Auch Anfragen, die am Semaphore gewartet haben
+                try:
+                    async with session.get(f"{self.api_url}{path}", params=params) as response:
+                        if response.status >= 500 or response.status == 429:
+                            self.breaker.record_failure(probe)
+                        elif response.status < 400:
+                            self.breaker.record_success(probe)
+                        else:
+                            self.breaker.release_probe(probe)
+                        if response.status != 200:
+                            result = str(response.status)
+                            logger.error(f"⚠️ Panel request {path} failed ({response.status}): {await response.text()}")
+                        response.raise_for_status()
+                        data = await response.json()
+                        result = "ok"
+                        return data
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                    self.breaker.record_failure(probe)
+                    raise
+                except BaseException:
+                    self.breaker.release_probe(probe)  # z.B. abgebrochen: nächste Probe-Anfrage zulassen
+                    raise
+        except CircuitOpenError:
+            result = "circuit_open"
+            raise
+        finally:
+            metrics.panel_requests.inc(endpoint, result)
+            metrics.panel_fetch_seconds.observe(time.monotonic() - start, endpoint)
+
+    async def fetch_server_status(self, server_id):
+        """Fetches the current server status from the Pterodactyl API, raising on errors."""
+        try:
+            data = await self.request_json("resources", f"/api/client/servers/{server_id}/resources")
+            attributes = data["attributes"]
+            if attributes.get("resources"):
+                self.resource_history.record(self.get_server_key(server_id), attributes["resources"])
+            return attributes["current_state"]
+        except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+            logger.error(f"⚠️ Error fetching server status for {server_id}: {e!r}")
+            raise
+        except (aiohttp.ContentTypeError, KeyError, TypeError, ValueError) as e:
+            # Kein JSON oder unerwarteter Aufbau (z.B. Proxy-Fehlerseite mit Status 200)
+            logger.error(f"⚠️ Invalid status response for {server_id}: {type(e).__name__}: {e}")  # repr enthielte die Header samt API-Key
+            raise
+
+    def get_cache_stats(self):
+        """Returns the cache counters (misses, coalesced, negative hits, evictions) and size,
+        summed over all panels."""
+        stats = {**self.cache.stats, "size": len(self.cache)}
+        for client in self.panel_clients.values():
+            for key, value in client.get_cache_stats().items():
+                stats[key] += value
+        return stats
+
+    async def fetch_server_list(self):
+        """Fetches all servers visible to the API key via the paginated /api/client endpoint."""
+        page_size = config.get("bulk_page_size", 50)
+        server_info = {}
+        page = 1
+        total_pages = 1
+
+        while page <= total_pages:
+            data = await self.request_json("list", "/api/client", params={"page": page, "per_page": page_size})
+
+            for server in data["data"]:
+                attributes = server["attributes"]
+                server_info[attributes["identifier"]] = attributes
+                server_info[attributes["uuid"]] = attributes
+
+            total_pages = data["meta"]["pagination"]["total_pages"]
+            page += 1
+
+        self.server_info = server_info
+        self.server_info_time = time.time()
+        return server_info
+
+    async def get_fleet_status(self, server_ids):
+        """Fetches the status of many servers (possibly on several panels) using each panel's server list."""
+        groups = {}  # client -> {panel_server_id: server_id}
+        statuses = {}
+        for server_id in server_ids:
+            try:
+                client, panel_server_id = self.get_client(server_id)
+            except KeyError as e:
+                logger.error(f"⚠️ {e.args[0]}")
+                statuses[server_id] = "unknown"
+                continue
+            groups.setdefault(client, {})[panel_server_id] = server_id
+
+        results = await asyncio.gather(
+            *(client.get_panel_fleet_status(list(ids)) for client, ids in groups.items()))
+        for (client, ids), panel_statuses in zip(groups.items(), results):
+            statuses.update({ids[panel_server_id]: status for panel_server_id, status in panel_statuses.items()})
+        return statuses
+
+    async def get_panel_fleet_status(self, server_ids):
+        """Fetches the status of many servers of this panel, using the server list to skip per-server requests.
+
+        Suspended, installing or transferring servers get their state from the list directly, servers missing
+        from the list are reported as "unknown". Only the remaining servers need /resources for their power state.
+        """
+        await self.refresh_server_list()
+
+        statuses = {}
+        live_ids = []
+        for server_id in server_ids:
+            info = self.server_info.get(server_id)
+            if not self.server_info:
+                live_ids.append(server_id)  # Liste nicht verfügbar: einzeln abfragen
+            elif info is None:
+                statuses[server_id] = "unknown"
+            elif info.get("status") or info.get("is_transferring"):
+                statuses[server_id] = info.get("status") or "transferring"
+                self.update_cache(server_id, statuses[server_id])
+            else:
+                live_ids.append(server_id)
+
+        results = await asyncio.gather(*(self.get_server_status(server_id) for server_id in live_ids))
+        statuses.update(zip(live_ids, results))
+        return statuses
+
+    async def refresh_server_list(self):
+        """Fetches the server list again if it is older than `bulk_list_interval`."""
+        list_interval = config.get("bulk_list_interval", config.get("monitor_interval", 60))
+        if time.time() - self.server_info_time >= list_interval:
+            try:
+                await self.fetch_server_list()
+            except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError) as e:
+                self.server_info_time = time.time()  # Erst nach `bulk_list_interval` erneut versuchen
+                logger.error(f"⚠️ Error fetching server list: {e!r}")
+
+    async def refresh_server_lists(self):
+        """Refreshes the server lists of all panels in use (source of the resource limits)."""
+        await asyncio.gather(self.refresh_server_list(),
+                             *(client.refresh_server_list() for client in self.panel_clients.values()))
+
+    def get_server_limits(self, server_id):
+        """Returns the limits of a server from the server list ({"memory": MiB, "disk": MiB, "cpu": %, ...}).
+
+        Returns an empty dict if the server list was not fetched yet. A limit of 0 means unlimited.
+        """
+        try:
+            client, panel_server_id = self.get_client(server_id)
+        except KeyError:
+            return {}
+        return client.server_info.get(panel_server_id, {}).get("limits") or {}
+
+    def discard_cache(self, server_ids):
+        """Removes the cached status of servers (e.g. removed from the config) from their panel's cache."""
+        for server_id in server_ids:
+            # Wie get_client, legt aber keinen Client für ein Panel an, das nichts im Cache haben kann
+            panel, separator, panel_server_id = server_id.rpartition(":")
+            client = self.panel_clients.get(panel) if separator else self
+            if client:
+                client.cache.discard([panel_server_id])
+
+    def update_cache(self, server_id, status):
+        """Stores a status received from outside the polling path (e.g. a websocket event)."""
+        try:
+            client, panel_server_id = self.get_client(server_id)
+        except KeyError:
+            return
+        client.cache.set(panel_server_id, status)
+
+    async def get_websocket_credentials(self, server_id):
+        """Returns the Wings websocket URL and a short-lived token for a server."""
+        data = (await self.request_json("websocket", f"/api/client/servers/{server_id}/websocket"))["data"]
+        return data["socket"], data["token"]
+
+pterodactyl_api = PterodactylAPI()
@@ -1,116 +1,210 @@
 import asyncio
+import itertools
 import time
 from logger import logger
-from pterodactyl_api import pterodactyl_api
+import metrics
+
+queues = []  # Alle RateLimitQueue-Instanzen, für die Queue-Metriken
+
+metrics.Gauge("plsnerfbot_queue_depth", "Tasks waiting in a rate limit queue.", ["queue"],
+              callback=lambda: {(queue.name,): queue.qsize() for queue in queues})
+
+
+class TokenBucket:
+    """Token bucket that refills continuously and slows down after observed rate limits."""
+
+    def __init__(self, max_requests, timeframe):
+        """
+        :param max_requests: Bucket capacity (burst size)
+        :param timeframe: Seconds in which `max_requests` tokens are refilled
+        """
+        self.capacity = max_requests
+        self.base_rate = max_requests / timeframe
+        self.rate = self.base_rate
+        self.tokens = max_requests
+        self.updated = time.monotonic()
+        self.blocked_until = 0
+
+    def refill(self, now):
+        """Adds the tokens accumulated since the last refill."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def get_wait(self, now):
+        """Returns the number of seconds until a request may be sent (0 if one may be sent now)."""
+        self.refill(now)
+        wait = max(0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def consume(self):
+        """Takes one token for a request that is being sent."""
+        self.tokens -= 1
+
+    def apply_rate_limit(self, retry_after, limit=None):
+        """Blocks the bucket for `retry_after` seconds and lowers its rate (or capacity, if the limit is known)."""
+        now = time.monotonic()
+        self.refill(now)
+        self.tokens = 0
+        self.blocked_until = max(self.blocked_until, now + retry_after)
+        if limit:
+            self.capacity = min(self.capacity, limit)
+        self.rate = max(self.base_rate / 8, self.rate / 2)
+
+    def recover(self):
+        """Slowly raises a lowered rate back to its configured value after successful requests."""
+        self.rate = min(self.base_rate, self.rate * 1.25)
+
+
+class RouteState:
+    """Pending tasks, token bucket and worker of a single route (e.g. one Discord channel)."""
+
+    def __init__(self, max_requests, timeframe):
+        self.pending = {}  # key -> task_info, in Einfügereihenfolge (ein Slot pro Schlüssel)
+        self.bucket = TokenBucket(max_requests, timeframe)
+        self.worker = None
 
 
 class RateLimitQueue:
-    """Handles API requests with rate limits and prevents unnecessary updates."""
+    """Handles API requests with per-route rate limits. Tasks with the same key replace each other (last writer wins).
+
+    Every route (e.g. a channel ID) has its own token bucket and worker, so a rate-limited channel does not
+    block the others. An optional global bucket limits all routes together.
+    """
 
-    def __init__(self, delay, max_requests, timeframe):
+    def __init__(self, delay, max_requests, timeframe, global_max_requests=None, global_timeframe=1, name="queue"):
         """
-        :param delay: Delay in seconds between each request
-        :param max_requests: Maximum requests allowed per timeframe
+        :param delay: Delay in seconds between each request on the same route
+        :param max_requests: Maximum requests allowed per timeframe and route
         :param timeframe: Timeframe for max_requests enforcement (in seconds)
+        :param global_max_requests: Maximum requests per global_timeframe across all routes (None = no limit)
+        :param global_timeframe: Timeframe for global_max_requests enforcement (in seconds)
+        :param name: Name of the queue in logs and metrics
         """
-        self.queue = asyncio.Queue()
+        self.name = name
         self.delay = delay
         self.max_requests = max_requests
         self.timeframe = timeframe
-        self.request_timestamps = []
-        self.running = False
-        self.lock = asyncio.Lock()  # 🔒 Lock zur Vermeidung von Race Conditions
-        self.processing_task = None
-        self.last_rate_limit_wait = 0  # Speichert den letzten Discord-Rate-Limit-Wert
+        self.global_bucket = TokenBucket(global_max_requests, global_timeframe) if global_max_requests else None
+        self.routes = {}  # route -> RouteState
+        self.task_ids = itertools.count()  # Eindeutige Schlüssel für Tasks ohne eigenen Schlüssel
+        queues.append(self)
+
+    def qsize(self):
+        """Returns the number of pending tasks across all routes."""
+        return sum(len(state.pending) for state in self.routes.values())
 
     def log_queue(self):
         """Logs the current queue size and upcoming tasks."""
-        queue_size = self.queue.qsize()
+        queue_size = self.qsize()
         if queue_size > 0:
-            logger.info(f"📋 Queue Status: {queue_size} tasks pending")
+            logger.debug(f"📋 {self.name} queue: {queue_size} tasks pending")
         else:
-            logger.debug("✅ Queue is empty.")
+            logger.debug(f"✅ {self.name} queue is empty.")
 
-    async def process_queue(self):
-        """Processes the queue, ensuring stable request handling."""
-        while not self.queue.empty():
-            async with self.lock:
-                try:
-                    now = time.time()
-                    self.request_timestamps = [t for t in self.request_timestamps if now - t < self.timeframe]
-
-                    # 🛑 Falls ein Rate-Limit aktiv ist, warten wir
-                    if self.last_rate_limit_wait > 0:
-                        logger.warning(f"⏳ Waiting {self.last_rate_limit_wait:.2f} seconds due to rate limit...")
-                        await asyncio.sleep(self.last_rate_limit_wait)
-                        self.last_rate_limit_wait = 0  # Reset
-
-                    if len(self.request_timestamps) >= self.max_requests:
-                        sleep_time = self.timeframe - (now - self.request_timestamps[0])
-                        logger.warning(f"⏳ Rate limit reached! Waiting {sleep_time:.2f} seconds...")
-                        await asyncio.sleep(sleep_time)
-
-                    batch_size = min(self.queue.qsize(), 5)
-                    tasks = []
-
-                    # 🆕 **Tasks auf ihre Gültigkeit prüfen, bevor sie ausgeführt werden**
-                    for _ in range(batch_size):
-                        task_info = await self.queue.get()
-                        if await self.is_task_valid(task_info):
-                            tasks.append(task_info)
-                        else:
-                            logger.info(f"🗑️ Removed outdated task for {task_info['server_name']} (status changed).")
-
-                    # **Nur gültige Tasks ausführen**
-                    for task_info in tasks:
-                        try:
-                            response = await task_info["task"]()
-                            if response and hasattr(response, "retry_after"):
-                                self.last_rate_limit_wait = response.retry_after
-                                logger.warning(f"⏳ Discord rate limit detected: {response.retry_after} seconds")
-                        except Exception as e:
-                            logger.error(f"❌ Error executing task: {e}")
-
-                        await asyncio.sleep(self.delay)
-
-                    self.log_queue()
+    @staticmethod
+    def get_rate_limit(error):
+        """Extracts (retry_after, limit) from a rate-limit exception, or None if it is not one.
 
+        Understands `discord.RateLimited` (retry_after attribute) and HTTP 429 errors carrying Discord's
+        `Retry-After` / `X-RateLimit-*` headers.
+        """
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after is not None:
+            return float(retry_after), None
+
+        if getattr(error, "status", None) == 429:
+            headers = getattr(getattr(error, "response", None), "headers", None) or {}
+            retry_after = headers.get("Retry-After") or headers.get("X-RateLimit-Reset-After") or 1
+            limit = headers.get("X-RateLimit-Limit")
+            return float(retry_after), int(limit) if limit else None
+
+        return None
+
+    def get_wait(self, state):
+        """Returns how long a route has to wait for its own and the global bucket."""
+        now = time.monotonic()
+        wait = state.bucket.get_wait(now)
+        if self.global_bucket:
+            wait = max(wait, self.global_bucket.get_wait(now))
+        return wait
+
+    async def process_route(self, route, state):
+        """Processes the tasks of one route, waiting for its token bucket without blocking other routes."""
+        try:
+            while state.pending:
+                wait = self.get_wait(state)
+                if wait > 0:
+                    if wait >= 1:
+                        logger.info(f"⏳ Rate limit for {route}: waiting {wait:.2f} seconds...", extra={"channel": route})
+                    await asyncio.sleep(wait)
+                    metrics.ratelimit_wait_seconds.inc(self.name, amount=wait)
+                    continue
+
+                # Immer den aktuellsten Task pro Schlüssel ausführen
+                key = next(iter(state.pending))
+                task_info = state.pending.pop(key)
+                state.bucket.consume()
+                if self.global_bucket:
+                    self.global_bucket.consume()
+
+                start = time.monotonic()
+                try:
+                    await task_info["task"]()
+                    state.bucket.recover()
                 except Exception as e:
-                    logger.error(f"❌ Error processing queue: {e}")
-
-            self.running = False
-            self.processing_task = None
-
-    async def add_task(self, coro, server_name=None, status=None):
-        """Adds a task to the queue and starts processing if not already running."""
-        task_info = {"task": coro, "server_name": server_name, "status": status}
-
-        # 🛑 Falls genau dieser Task schon existiert, nicht erneut hinzufügen
-        if any(t["server_name"] == server_name and t["status"] == status for t in self.queue._queue):
-            logger.debug(f"🔄 Task already in queue for {server_name} (status: {status}), skipping duplicate.")
-            return
-
-        await self.queue.put(task_info)
-
-        if not self.running:
-            self.running = True
-            self.processing_task = asyncio.create_task(self.process_queue())
-
-    async def is_task_valid(self, task_info):
-        """Checks if a queued task is still valid before execution."""
-        server_name = task_info["server_name"]
-        task_status = task_info["status"]
-
-        if not server_name or not task_status:
-            return True  # Falls der Task nicht mit einem Serverstatus verknüpft ist, führen wir ihn aus.
-
-        current_status = pterodactyl_api.get_server_status(server_name)
+                    rate_limit = self.get_rate_limit(e)
+                    if rate_limit is None:
+                        logger.debug(f"❌ Error executing task {key}: {e}")
+                    else:
+                        retry_after, limit = rate_limit
+                        logger.warning(f"⏳ Discord rate limit detected for {route}: retry after {retry_after:.2f} seconds",
+                                       extra={"channel": route})
+                        state.bucket.apply_rate_limit(retry_after, limit)
+                        metrics.ratelimit_hits.inc(self.name)
+                        # Erneut vorne einreihen, außer es wurde inzwischen ein neuerer Task eingestellt
+                        if key not in state.pending:
+                            state.pending = {key: task_info, **state.pending}
+                finally:
+                    metrics.dispatch_seconds.observe(time.monotonic() - start, self.name)
+
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+
+            self.log_queue()
+        except Exception as e:
+            logger.error(f"❌ Error processing queue for {route}: {e}")
+        finally:
+            state.worker = None
+
+    async def add_task(self, coro, key=None, route=None):
+        """Adds a task to the queue of its route and starts that route's worker if not already running.
+
+        Tasks should re-raise exceptions so that Discord rate limits are detected and the task is retried.
+
+        :param key: Slot for the task (e.g. a channel ID). A newer task with the same key replaces the queued one.
+        :param route: Rate-limit route of the task (e.g. a channel ID); routes are limited independently.
+        """
+        if key is None:
+            key = ("task", next(self.task_ids))
 
-        # **Falls der Serverstatus sich geändert hat, ignorieren wir den Task**
-        if task_status != current_status:
-            logger.warning(f"🗑️ Discarding outdated task for {server_name}: {task_status} → {current_status}")
-            return False
+        state = self.routes.get(route)
+        if state is None:
+            state = self.routes[route] = RouteState(self.max_requests, self.timeframe)
 
-        return True
+        if key in state.pending:
+            # 🔄 Neuerer Zustand ersetzt den wartenden Task, die Position in der Queue bleibt erhalten
+            state.pending[key]["task"] = coro
+            logger.debug(f"🔄 Replaced queued task for {key} with a newer one.")
+        else:
+            state.pending[key] = {"task": coro, "key": key}
 
+        if state.worker is None:
+            state.worker = asyncio.create_task(self.process_route(route, state))
 
+    def discard(self, key, route=None):
+        """Removes a queued task, e.g. when the desired state is already applied."""
+        state = self.routes.get(route)
+        if state and state.pending.pop(key, None) is not None:
+            logger.debug(f"🗑️ Removed queued task for {key} (no longer needed).")
@@ -0,0 +1,110 @@
+import time
+from discord_bot import bot
+from config import config
+from language import lang
+from logger import logger
+
+MIB = 1024 * 1024
+TREND_MIN_SAMPLES = 10  # Trends erst ab so vielen Messwerten schätzen
+TREND_MIN_USAGE = 0.5  # Trend-Warnungen erst ab halb ausgeschöpftem Limit (Anlaufphase nach dem Start ignorieren)
+
+
+def get_slope(series):
+    """Returns the least-squares slope (units per second) of [(timestamp, value), ...]."""
+    count = len(series)
+    mean_t = sum(t for t, _ in series) / count
+    mean_v = sum(v for _, v in series) / count
+    variance = sum((t - mean_t) ** 2 for t, _ in series)
+    if not variance:
+        return 0
+    return sum((t - mean_t) * (v - mean_v) for t, v in series) / variance
+
+
+class ResourceAlerts:
+    """Checks the resource history of running servers against their limits and sends alerts to text channels.
+
+    Alerts: CPU above `cpu_alert_percent` of the limit for `resource_alert_duration` seconds, memory or disk
+    above `memory_alert_percent` / `disk_alert_percent`, and memory or disk rising fast enough to reach the
+    limit within `resource_trend_horizon` seconds. Every alert repeats at most once per `resource_alert_cooldown`.
+    """
+
+    def __init__(self, rate_limiter):
+        """
+        :param rate_limiter: RateLimitQueue used to send the alerts (routed per channel)
+        """
+        self.rate_limiter = rate_limiter
+        self.last_alert = {}  # (server_id, alert key) -> Zeitpunkt der letzten Warnung (monotonic)
+
+    def get_alerts(self, buffer, limits, since, now):
+        """Returns a list of (locale key, placeholders) for the samples of one server recorded after `since`."""
+        alerts = []
+
+        cpu_limit = limits.get("cpu") or 0
+        duration = config.get("resource_alert_duration", 300)
+        cpu_series = buffer.get_series("cpu_absolute", since=since)
+        recent = [value for timestamp, value in cpu_series if timestamp >= now - duration]
+        if cpu_limit and len(recent) >= 2 and cpu_series[0][0] <= now - duration:
+            threshold = cpu_limit * config.get("cpu_alert_percent", 90) / 100
+            if min(recent) >= threshold:
+                alerts.append(("resource_cpu_high", {"value": round(min(recent) / cpu_limit * 100),
+                                                     "minutes": round(duration / 60)}))
+
+        for resource in ("memory", "disk"):
+            limit = (limits.get(resource) or 0) * MIB
+            if not limit:
+                continue  # 0 = unbegrenzt
+
+            series = buffer.get_series(f"{resource}_bytes", since=since)
+            if not series:
+                continue
+            usage = series[-1][1]
+            if usage >= limit * config.get(f"{resource}_alert_percent", 90) / 100:
+                alerts.append((f"resource_{resource}_high", {"value": round(usage / limit * 100)}))
+                continue
+
+            if len(series) < TREND_MIN_SAMPLES or usage < limit * TREND_MIN_USAGE:
+                continue
+            slope = get_slope(series)
+            if slope > 0 and (limit - usage) / slope <= config.get("resource_trend_horizon", 1800):
+                alerts.append((f"resource_{resource}_trend", {"minutes": max(1, round((limit - usage) / slope / 60))}))
+
+        return alerts
+
+    async def check(self, server_name, server_id, buffer, limits, since):
+        """Sends the alerts of one server that are not in their cooldown.
+
+        :param buffer: ResourceBuffer of the server
+        :param limits: Limits from the server list ({"memory": MiB, "disk": MiB, "cpu": %})
+        :param since: Monotonic time since which the server is running (older samples are ignored)
+        """
+        text_channel_id = config.get_text_channel(server_name)
+        if not text_channel_id or not limits:
+            return
+
+        now = time.monotonic()
+        cooldown = config.get("resource_alert_cooldown", 1800)
+        for key, placeholders in self.get_alerts(buffer, limits, since, now):
+            alert_id = (server_id, key)
+            if now - self.last_alert.get(alert_id, -cooldown) < cooldown:
+                continue
+            self.last_alert[alert_id] = now
+
+            channel = bot.get_channel(text_channel_id)
+            language = lang.get_language(server_name, channel.guild.id if channel else None)
+            message = lang.get(key, language, server=server_name, **placeholders)
+            logger.info(f"📈 Resource alert for {server_name}: {key}", extra={"server": server_name})
+
+            async def send_alert(message=message):
+                try:
+                    await bot.send_discord_message(text_channel_id, message)
+                except Exception as e:
+                    logger.error(f"❌ Failed to send resource alert for {server_name}: {e}",
+                                 extra={"server": server_name, "channel": text_channel_id})
+                    raise  # Die Queue erkennt Rate-Limits und wiederholt den Task
+
+            await self.rate_limiter.add_task(send_alert, key=("alert",) + alert_id, route=text_channel_id)
+
+    def forget(self, server_ids):
+        """Drops the cooldowns of servers that are no longer configured."""
+        server_ids = set(server_ids)
+        self.last_alert = {alert_id: sent for alert_id, sent in self.last_alert.items() if alert_id[0] not in server_ids}
@@ -0,0 +1,90 @@
+import time
+from array import array
+
+# Felder aus dem `resources`-Objekt von /resources bzw. dem `stats`-Event der Wings
+RESOURCE_FIELDS = ("cpu_absolute", "memory_bytes", "disk_bytes", "network_rx_bytes", "network_tx_bytes")
+SAMPLE_WIDTH = len(RESOURCE_FIELDS) + 1  # + Zeitstempel
+
+
+class ResourceBuffer:
+    """Fixed-size ring buffer of resource samples, stored in a single float array."""
+
+    __slots__ = ("size", "data", "head", "count")
+
+    def __init__(self, size):
+        self.size = size
+        self.data = array("d", bytes(8 * size * SAMPLE_WIDTH))
+        self.head = 0  # Index des nächsten Schreibplatzes
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, timestamp, values):
+        """Stores a sample, overwriting the oldest one when the buffer is full."""
+        offset = self.head * SAMPLE_WIDTH
+        self.data[offset] = timestamp
+        self.data[offset + 1:offset + SAMPLE_WIDTH] = array("d", values)
+        self.head = (self.head + 1) % self.size
+        self.count = min(self.size, self.count + 1)
+
+    def get_series(self, field, since=None):
+        """Returns [(timestamp, value), ...] of one field, oldest first, optionally only samples after `since`."""
+        column = RESOURCE_FIELDS.index(field) + 1
+        series = []
+        for index in range(self.head - self.count, self.head):
+            offset = (index % self.size) * SAMPLE_WIDTH
+            timestamp = self.data[offset]
+            if since is None or timestamp >= since:
+                series.append((timestamp, self.data[offset + column]))
+        return series
+
+    def latest(self):
+        """Returns the newest sample as a {field: value} dict including `timestamp`, or None."""
+        if not self.count:
+            return None
+        offset = ((self.head - 1) % self.size) * SAMPLE_WIDTH
+        sample = dict(zip(RESOURCE_FIELDS, self.data[offset + 1:offset + SAMPLE_WIDTH]))
+        sample["timestamp"] = self.data[offset]
+        return sample
+
+
+class ResourceHistory:
+    """Keeps the recent resource usage of every server in bounded ring buffers."""
+
+    def __init__(self, size, min_interval=0):
+        """
+        :param size: Number of samples kept per server
+        :param min_interval: Samples arriving faster than this (in seconds) are dropped, e.g. Wings stats events
+        """
+        self.size = size
+        self.min_interval = min_interval
+        self.buffers = {}  # server_id -> ResourceBuffer
+        self.updated = set()  # server_ids mit neuen Messwerten seit dem letzten pop_updated()
+
+    def record(self, server_id, resources, now=None):
+        """Stores the `resources` object of a /resources response or Wings stats event."""
+        now = time.monotonic() if now is None else now
+        buffer = self.buffers.get(server_id)
+        if buffer is None:
+            buffer = self.buffers[server_id] = ResourceBuffer(self.size)
+        elif now - buffer.latest()["timestamp"] < self.min_interval:
+            return
+
+        buffer.append(now, [float(resources.get(field) or 0) for field in RESOURCE_FIELDS])
+        self.updated.add(server_id)
+
+    def get(self, server_id):
+        """Returns the ring buffer of a server, or None if no sample was recorded yet."""
+        return self.buffers.get(server_id)
+
+    def pop_updated(self):
+        """Returns the servers that received new samples since the last call."""
+        updated, self.updated = self.updated, set()
+        return updated
+
+    def discard(self, server_ids):
+        """Drops the history of servers that are no longer configured."""
+        for server_id in server_ids:
+            self.buffers.pop(server_id, None)
+            self.updated.discard(server_id)
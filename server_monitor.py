@@ -1,22 +1,64 @@
 import asyncio
+import functools
+import time
 from discord_bot import bot
 from pterodactyl_api import pterodactyl_api
 from config import config
 from language import lang  # Language support
 from rate_limit_queue import RateLimitQueue
+from poll_scheduler import PollScheduler
+from wings_listener import WingsListener
+from notification_batcher import NotificationBatcher
+from resource_alerts import ResourceAlerts
+from state_store import state_store
+from shard_pool import ShardPool
 from logger import logger
+import metrics
 
+UNKNOWN = "unknown"  # Panel nicht erreichbar oder Circuit Breaker offen: letzter bekannter Zustand bleibt
+
+# 🔄 Status -> Übersetzungsschlüssel der Textmeldung (alles andere gilt als offline)
+STATUS_MESSAGES = {
+    "starting": "server_starting",
+    "stopping": "server_stopping",
+    "running": "server_online",
+}
 
 class ServerMonitor:
     """Monitors Pterodactyl server status and updates Discord text and voice channels accordingly."""
 
     def __init__(self):
-        self.last_status = {}
-        self.last_channel_update = {}
-
-        # 🎯 Nutzt die **beste** `RateLimitQueue`
-        self.voice_rate_limiter = RateLimitQueue(delay=5, max_requests=2, timeframe=600)  # 2 alle 10 Min.
-        self.text_rate_limiter = RateLimitQueue(delay=0.02, max_requests=50, timeframe=1)  # 50 pro Sekunde
+        # 🎯 Soll-Zustand aus der API (server_id -> status) und Server, die abgeglichen werden müssen
+        self.desired_status = {}
+        self.dirty_servers = set()
+
+        # 💾 Zuletzt im Textkanal gemeldeter Status, über Neustarts hinweg gespeichert, damit nur echte
+        # Änderungen gemeldet werden (Voice-Kanal-Namen liefert der Discord-Cache nach dem Start selbst)
+        self.last_status = state_store.mapping("last_status")
+        # 📨 Status, deren Textmeldung noch gesammelt oder gesendet wird (server_id -> status)
+        self.announcing = {}
+        self.last_cycle_duration = 0
+        self.scheduler = PollScheduler()
+        self.listener = WingsListener(self.handle_status)
+        self.shard_pool = ShardPool(self.handle_status)
+
+        # 🎯 Rate-Limits pro Kanal (Discord-Buckets), Kanäle laufen parallel
+        self.voice_rate_limiter = RateLimitQueue(
+            delay=5, max_requests=2, timeframe=600, name="voice")  # 2 alle 10 Min. pro Kanal
+        self.text_rate_limiter = RateLimitQueue(
+            delay=0.02, max_requests=5, timeframe=5,  # 5 pro 5 Sek. pro Kanal
+            global_max_requests=50, global_timeframe=1, name="text")  # 50 pro Sekunde insgesamt
+        self.notification_batcher = NotificationBatcher(self.text_rate_limiter)
+        self.resource_alerts = ResourceAlerts(self.text_rate_limiter)
+
+        # 👀 Manuell umbenannte Voice-Kanäle sofort erkennen (Discord-Cache, keine API-Abfrage)
+        bot.add_listener(self.on_guild_channel_update, "on_guild_channel_update")
+
+    async def on_guild_channel_update(self, before, after):
+        """Marks a server for reconciliation when its voice channel was changed outside the bot."""
+        server_name = config.get_voice_channel_server(after.id)
+        if server_name and before.name != after.name:
+            self.dirty_servers.add(server_name)
 
     async def get_voice_channel_name(self, voice_channel_id):
         """Fetches the current voice channel name to avoid unnecessary updates."""
@@ -26,10 +68,9 @@ class ServerMonitor:
     async def update_voice_channel(self, server_name, status):
         """Updates the voice channel name with the localized status, respecting rate limits."""
 
-        config.reload_config()
         server_mapping = config.get("server_mappings", {}).get(server_name)
         if not server_mapping:
-            logger.warning(f"⚠️ No mapping found for {server_name}, skipping...")
+            logger.warning(f"⚠️ No mapping found for {server_name}, skipping...", extra={"server": server_name})
             return
 
         voice_channel_id = config.get_voice_channel(server_name)
@@ -38,114 +79,242 @@ class ServerMonitor:
 
         channel = bot.get_channel(voice_channel_id)
         if not channel:
-            logger.error(f"❌ Voice channel {voice_channel_id} not found for {server_name}")
+            logger.error(f"❌ Voice channel {voice_channel_id} not found for {server_name}",
+                         extra={"server": server_name, "channel": voice_channel_id})
             return
 
-        new_name = lang.get("voice_online" if status == "running" else "voice_offline", server=server_name)
+        language = lang.get_language(server_name, channel.guild.id)
+        new_name = lang.get("voice_online" if status == "running" else "voice_offline", language, server=server_name)
         current_name = await self.get_voice_channel_name(voice_channel_id)
 
+        # Ein Slot pro Voice-Kanal: nur der zuletzt gewünschte Name wird angewendet
+        queue_key = ("voice", voice_channel_id)
         if current_name == new_name:
-            logger.info(f"⏳ Skipping voice channel update for {server_name} (already correct).")
+            self.voice_rate_limiter.discard(queue_key, route=voice_channel_id)
+            logger.debug(f"⏳ Skipping voice channel update for {server_name} (already correct).",
+                         extra={"server": server_name, "channel": voice_channel_id})
             return
 
         async def edit_channel():
+            if channel.name == new_name:
+                return  # Inzwischen bereits korrekt, kein Rate-Limit verbrauchen
             try:
                 response = await channel.edit(name=new_name)
-                self.last_channel_update[server_name] = new_name
-                logger.info(f"✅ Updated voice channel name to: {new_name}")
+                logger.info(f"✅ Updated voice channel name to: {new_name}",
+                            extra={"server": server_name, "channel": voice_channel_id})
                 return response
             except Exception as e:
-                logger.error(f"❌ Failed to update voice channel name for {server_name}: {e}")
+                logger.error(f"❌ Failed to update voice channel name for {server_name}: {e}",
+                             extra={"server": server_name, "channel": voice_channel_id})
+                raise  # Die Queue erkennt Rate-Limits und wiederholt den Task
+
+        await self.voice_rate_limiter.add_task(edit_channel, key=queue_key, route=voice_channel_id)
 
-        await self.voice_rate_limiter.add_task(edit_channel)
+    async def send_text_notification(self, server_name, status, on_delivered=None):
+        """Queues a status update for the designated text channel, where it is batched with other changes.
 
-    async def send_text_notification(self, server_name, status):
-        """Sends a status update to the designated text channel, avoiding spam."""
+        :param on_delivered: Called as on_delivered(delivered) once the message was sent or dropped
+        """
 
-        config.reload_config()
         text_channel_id = config.get_text_channel(server_name)
         if not text_channel_id:
+            if on_delivered:
+                on_delivered(True)  # Nichts zu senden
             return  # Kein Text-Kanal zugewiesen, also überspringen
 
-        # 🔄 Statusmeldungen für "starting" und "stopping"
-        if status == "starting":
-            message = lang.get("server_starting", server=server_name)
-        elif status == "stopping":
-            message = lang.get("server_stopping", server=server_name)
-        elif status == "running":
-            message = lang.get("server_online", server=server_name)
-        else:
-            message = lang.get("server_offline", server=server_name)
-
-        async def send_message():
-            try:
-                response = await bot.send_discord_message(text_channel_id, message)
-                logger.info(f"✅ Status update sent to {server_name}: {message}")
-                return response
-            except Exception as e:
-                logger.error(f"❌ Failed to send status update for {server_name}: {e}")
+        channel = bot.get_channel(text_channel_id)
+        language = lang.get_language(server_name, channel.guild.id if channel else None)
+        message = lang.get(STATUS_MESSAGES.get(status, "server_offline"), language, server=server_name)
 
-        await self.text_rate_limiter.add_task(send_message)
+        # 📦 Änderungen pro Kanal kurz sammeln und gebündelt senden
+        await self.notification_batcher.add(text_channel_id, server_name, message, on_delivered=on_delivered)
 
-    async def check_servers(self):
-        """Periodically checks server status and updates Discord channels accordingly."""
-        await bot.wait_until_ready()
-        logger.info("📡 Server monitoring started...")
+    async def poll_servers(self, servers):
+        """Fetches the status of all given servers concurrently and returns a {server_id: status} dict."""
+        return await pterodactyl_api.get_statuses(servers.values())
 
-        while not bot.is_closed():
-            config.reload_config()
-            monitor_interval = config.get("monitor_interval", 60)
-
-            servers = config.get("servers", {})
-            server_mappings = config.get("server_mappings", {})
+    def set_desired_status(self, server_name, server_id, status):
+        """Stores the status reported by the API and marks the server if it differs from what Discord shows.
 
-            for server_name, server_id in servers.items():
-                status = pterodactyl_api.get_server_status(server_id)
+        An "unknown" status (panel unreachable) is ignored, so an outage does not announce every server as offline.
+        """
+        if status == UNKNOWN:
+            return
+        previous_status = self.desired_status.get(server_id)
+        if previous_status != status:
+            metrics.status_transitions.inc(previous_status or "none", status)
+        if previous_status != status or self.last_status.get(server_id) != status:
+            self.dirty_servers.add(server_name)
+        self.desired_status[server_id] = status
+
+    def on_announced(self, server_id, status, delivered):
+        """Records a status as announced once its text message was delivered.
+
+        Failed messages are retried by the next drift sweep, since `last_status` still differs. A message
+        superseded by a newer announcement is ignored; the newer one decides what is recorded.
+        """
+        if self.announcing.get(server_id) != status:
+            return
+        del self.announcing[server_id]
+        if delivered:
+            self.last_status[server_id] = status
+
+    async def reconcile(self, server_names):
+        """Brings text and voice channels of the given servers in line with their desired status.
+
+        Only the minimal set of edits is sent: a text notification if the last announced status differs,
+        a voice rename if the cached channel name differs. Returns the number of announced status changes.
+        """
+        servers = config.get("servers", {})
+        server_mappings = config.get("server_mappings", {})
+        changes = 0
+
+        for server_name in server_names:
+            server_id = servers.get(server_name)
+            status = self.desired_status.get(server_id)
+            if status is None or server_name not in server_mappings:
+                continue
+
+            # `last_status` wird erst nach erfolgreicher Zustellung gesetzt (on_announced). Mit der laufenden
+            # Meldung vergleichen, damit ein Zurückwechseln die wartende, veraltete Meldung ersetzt
+            if self.announcing.get(server_id, self.last_status.get(server_id)) != status:
+                self.announcing[server_id] = status
+                await self.send_text_notification(
+                    server_name, status, on_delivered=functools.partial(self.on_announced, server_id, status))
+                changes += 1
+
+            # Vergleicht intern mit dem gecachten Kanalnamen und sendet nur bei Abweichung
+            await self.update_voice_channel(server_name, status)
+
+        return changes
+
+    async def check_resources(self, servers):
+        """Checks the servers with new resource samples (from polls or Wings stats) for resource alerts."""
+        updated_ids = pterodactyl_api.resource_history.pop_updated()
+        if not config.get("resource_alerts", False) or not updated_ids:
+            return
 
-                if server_name not in server_mappings:
-                    logger.warning(
-                        f"⚠️ Server {server_name} wurde aus der Config entfernt oder umbenannt. Ignoriere...")
-                    continue
+        # Die Limits stehen in der Server-Liste (wird höchstens alle `bulk_list_interval` Sekunden geladen)
+        await pterodactyl_api.refresh_server_lists()
+        for server_name, server_id in servers.items():
+            if server_id not in updated_ids or self.desired_status.get(server_id) != "running":
+                continue
+            await self.resource_alerts.check(
+                server_name, server_id, pterodactyl_api.resource_history.get(server_id),
+                pterodactyl_api.get_server_limits(server_id), since=self.scheduler.stable_since.get(server_id))
+
+    async def handle_status(self, server_name, server_id, status):
+        """Pushes a status received via websocket or from a shard worker into the change path."""
+        if status == UNKNOWN:
+            return
+        pterodactyl_api.update_cache(server_id, status)
+        self.scheduler.schedule(server_id, status, time.monotonic())
 
-                if self.last_status.get(server_id) == status:
-                    continue
+        self.set_desired_status(server_name, server_id, status)
+        if server_name in self.dirty_servers:
+            self.dirty_servers.discard(server_name)
+            await self.reconcile([server_name])
 
-                await self.send_text_notification(server_name, status)
-                await self.update_voice_channel(server_name, status)
+    async def check_servers(self):
+        """Polls each server on its own jittered schedule and reconciles Discord channels with the results.
 
-                self.last_status[server_id] = status
+        Besides changed servers, every `status_validation_interval` seconds all servers are compared against
+        Discord's cached channel names to repair drift (e.g. a voice channel renamed by hand).
+        """
+        await bot.wait_until_ready()
+        logger.info("📡 Server monitoring started...")
 
-            await asyncio.sleep(monitor_interval)
+        window_start = time.monotonic()
+        window_polls = 0
+        window_changes = 0
+        next_drift_sweep = time.monotonic() + config.get("status_validation_interval", 300)
 
-    async def validate_discord_status(self):
-        """Regularly checks if the displayed Discord status matches the actual API status."""
-        await bot.wait_until_ready()
+        # 🧩 Optional: Polling auf Worker-Prozesse verteilen, dieser Prozess gleicht nur noch mit Discord ab
+        shard_workers = config.get("shard_workers", 0)
+        if shard_workers and not self.shard_pool.running:
+            self.shard_pool.start(shard_workers)
 
         while not bot.is_closed():
-            config.reload_config()
-            logger.info("🔄 Running periodic status validation...")
+            monitor_interval = config.get("monitor_interval", 60)
 
             servers = config.get("servers", {})
+            server_mappings = config.get("server_mappings", {})
+            removed_ids = set(self.scheduler.next_poll) - set(servers.values())
+            self.scheduler.forget(removed_ids)
+            pterodactyl_api.discard_cache(removed_ids)
+            pterodactyl_api.resource_history.discard(removed_ids)
+            self.resource_alerts.forget(removed_ids)
+            for server_id in removed_ids | (set(self.last_status) - set(servers.values())):
+                self.desired_status.pop(server_id, None)
+                self.announcing.pop(server_id, None)
+                self.last_status.pop(server_id, None)
+
+            # 🔌 Push-Modus: Server mit aktiver Websocket-Verbindung werden nicht gepollt
+            if config.get("status_mode", "poll") == "push" and not self.shard_pool.running:
+                self.listener.sync(servers)
+            elif self.listener.tasks:
+                await self.listener.close()
+            if self.shard_pool.running:
+                poll_ids = []  # Die Shard-Worker liefern die Statusänderungen
+            else:
+                poll_ids = [server_id for server_id in servers.values() if not self.listener.is_connected(server_id)]
+
+            cycle_start = time.monotonic()
+            due_ids = set(self.scheduler.get_due(poll_ids, cycle_start))
+            due_servers = {name: server_id for name, server_id in servers.items() if server_id in due_ids}
+
+            statuses = await self.poll_servers(due_servers)
+            now = time.monotonic()
+
+            for server_name, server_id in due_servers.items():
+                status = statuses[server_id]
+                # Bei Fehlern mit dem letzten bekannten Status planen, damit dessen Backoff erhalten bleibt
+                self.scheduler.schedule(
+                    server_id, self.desired_status.get(server_id, status) if status == UNKNOWN else status, now)
 
-            for server_name, server_id in servers.items():
-                actual_status = pterodactyl_api.get_server_status(server_id)
-                displayed_status = self.last_status.get(server_id)
-
-                # Falls sich der Status geändert hat oder ein Mismatch existiert
-                if actual_status != displayed_status:
+                if server_name not in server_mappings:
+                    # Wird durch den RepeatFilter des Loggers nur einmal pro `log_dedup_window` ausgegeben
                     logger.warning(
-                        f"⚠️ Status mismatch detected for {server_name}: API says '{actual_status}', Discord shows '{displayed_status}'")
-
-                    # Erneut Text- und Voice-Updates anstoßen
-                    await self.send_text_notification(server_name, actual_status)
-                    await self.update_voice_channel(server_name, actual_status)
-
-                    # Aktualisiere gespeicherten Status
-                    self.last_status[server_id] = actual_status
+                        f"⚠️ Server {server_name} wurde aus der Config entfernt oder umbenannt. Ignoriere...",
+                        extra={"server": server_name})
+                    continue
 
-            # ⏳ Intervall für die Statusvalidierung (einstellbar in `config.json`)
-            validation_interval = config.get("status_validation_interval", 300)  # Default: alle 5 Minuten
-            await asyncio.sleep(validation_interval)
+                self.set_desired_status(server_name, server_id, status)
+
+            # 🔍 Regelmäßig alle Server gegen den Discord-Cache prüfen (ohne zusätzliche API-Abfragen)
+            if now >= next_drift_sweep:
+                logger.info("🔄 Running periodic status validation...")
+                self.dirty_servers.update(server_mappings)
+                next_drift_sweep = now + config.get("status_validation_interval", 300)
+
+            dirty_servers, self.dirty_servers = self.dirty_servers, set()
+            changes = await self.reconcile(dirty_servers)
+            await self.check_resources(servers)
+
+            if due_servers:
+                self.last_cycle_duration = time.monotonic() - cycle_start
+                metrics.poll_cycle_seconds.observe(self.last_cycle_duration)
+                metrics.polled_servers.inc(amount=len(due_servers))
+                logger.debug(
+                    f"📡 Polled {len(due_servers)} servers, {changes} changes in {self.last_cycle_duration:.2f}s")
+            window_polls += len(due_servers)
+            window_changes += changes
+
+            # 📊 Zusammenfassung einmal pro `monitor_interval`
+            if now - window_start >= monitor_interval:
+                cache_stats = pterodactyl_api.get_cache_stats()
+                logger.info(
+                    f"📡 Poll summary: {window_polls} polls, {window_changes} changes "
+                    f"in the last {now - window_start:.0f}s ({len(servers)} servers) | "
+                    f"cache: {cache_stats['misses']} requests, {cache_stats['coalesced']} coalesced, "
+                    f"{cache_stats['negative_hits']} negative hits")
+                window_start = now
+                window_polls = 0
+                window_changes = 0
+
+            # Höchstens einmal pro `poll_tick` Sekunden aufwachen, damit fällige Server gebündelt werden
+            poll_tick = config.get("poll_tick", 1)
+            await asyncio.sleep(min(monitor_interval, max(poll_tick, self.scheduler.time_until_next(time.monotonic()))))
 
 
 server_monitor = ServerMonitor()
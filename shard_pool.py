@@ -0,0 +1,142 @@
+import asyncio
+import json
+import os
+import sys
+import time
+import zlib
+
+if __name__ == "__main__":
+    # Worker-Prozess: stdout gehört den Status-Deltas, daher schon vor dem ersten Import nach stderr loggen
+    os.environ.setdefault("PLSNERFBOT_LOG_STREAM", "stderr")
+
+from logger import logger
+from config import config
+
+WORKER_SCRIPT = os.path.abspath(__file__)
+
+
+def get_shard(server_id, shard_count):
+    """Returns the shard index of a server (stable across processes, unlike hash())."""
+    return zlib.crc32(server_id.encode()) % shard_count
+
+
+class ShardPool:
+    """Runs the panel polling in `shard_workers` worker processes and forwards their status deltas.
+
+    Every worker loads config.json itself, polls only the servers of its shard and writes one JSON line per
+    poll tick with the changed statuses to stdout: [[server_name, server_id, status], ...].
+    """
+
+    def __init__(self, on_status):
+        """
+        :param on_status: Coroutine function called as on_status(server_name, server_id, status)
+        """
+        self.on_status = on_status
+        self.shard_count = 0
+        self.processes = {}  # shard index -> Prozess
+        self.tasks = []
+        self.running = False  # True, solange das Polling an Worker-Prozesse delegiert ist
+
+    def start(self, shard_count):
+        """Starts one reader task (and thereby one worker process) per shard."""
+        self.shard_count = shard_count
+        self.running = True
+        self.tasks = [asyncio.create_task(self.run_worker(index)) for index in range(shard_count)]
+        logger.info(f"🧩 Polling delegated to {shard_count} worker processes.")
+
+    async def run_worker(self, index):
+        """Keeps a worker process running and feeds its deltas into the monitor, restarting it if it exits."""
+        while self.running:
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    sys.executable, WORKER_SCRIPT, str(index), str(self.shard_count),
+                    stdout=asyncio.subprocess.PIPE, limit=2 ** 24)
+                self.processes[index] = process
+
+                async for line in process.stdout:
+                    # Fehlerhafte Zeilen werden übersprungen und beenden nicht das Lesen dieses Shards
+                    try:
+                        deltas = [(server_name, server_id, status) for server_name, server_id, status in json.loads(line)]
+                    except (ValueError, TypeError) as e:
+                        logger.error(f"❌ Invalid output of shard worker {index}: {e!r} (line: {line[:200]!r})")
+                        continue
+                    for server_name, server_id, status in deltas:
+                        try:
+                            await self.on_status(server_name, server_id, status)
+                        except Exception as e:
+                            logger.error(f"❌ Error handling status of {server_name} from shard worker {index}: {e!r}",
+                                         extra={"server": server_name})
+
+                await process.wait()
+                if self.running:
+                    logger.error(f"❌ Shard worker {index} exited with code {process.returncode}, restarting...")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Shard worker {index} failed: {e!r}, restarting...")
+                process = self.processes.get(index)
+                if process and process.returncode is None:
+                    process.terminate()
+            if self.running:
+                await asyncio.sleep(5)
+
+    async def stop(self):
+        """Stops all worker processes."""
+        self.running = False
+        for process in self.processes.values():
+            if process.returncode is None:
+                process.terminate()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, *(process.wait() for process in self.processes.values()),
+                             return_exceptions=True)
+        self.processes.clear()
+        self.tasks = []
+
+
+async def run_shard(index, shard_count):
+    """Worker process: polls the servers of one shard and writes status deltas to stdout."""
+    from pterodactyl_api import pterodactyl_api
+    from poll_scheduler import PollScheduler
+
+    asyncio.create_task(config.watch())
+    scheduler = PollScheduler()
+    last_sent = {}
+
+    while True:
+        servers = {server_name: server_id for server_name, server_id in config.get("servers", {}).items()
+                   if get_shard(server_id, shard_count) == index}
+        removed_ids = set(scheduler.next_poll) - set(servers.values())
+        scheduler.forget(removed_ids)
+        for server_id in removed_ids:
+            last_sent.pop(server_id, None)
+
+        now = time.monotonic()
+        due_ids = set(scheduler.get_due(servers.values(), now))
+        due_servers = {name: server_id for name, server_id in servers.items() if server_id in due_ids}
+        statuses = await pterodactyl_api.get_statuses(due_servers.values())
+
+        now = time.monotonic()
+        deltas = []
+        for server_name, server_id in due_servers.items():
+            status = statuses[server_id]
+            if status == "unknown":
+                # Panel nicht erreichbar: nichts melden, der Bot-Prozess behält den letzten bekannten Status
+                scheduler.schedule(server_id, last_sent.get(server_id, status), now)
+                continue
+            scheduler.schedule(server_id, status, now)
+            if last_sent.get(server_id) != status:
+                deltas.append([server_name, server_id, status])
+                last_sent[server_id] = status
+
+        if deltas:
+            sys.stdout.write(json.dumps(deltas, separators=(",", ":")) + "\n")
+            sys.stdout.flush()
+
+        monitor_interval = config.get("monitor_interval", 60)
+        poll_tick = config.get("poll_tick", 1)
+        await asyncio.sleep(min(monitor_interval, max(poll_tick, scheduler.time_until_next(time.monotonic()))))
+
+
+if __name__ == "__main__":
+    asyncio.run(run_shard(int(sys.argv[1]), int(sys.argv[2])))
@@ -0,0 +1,131 @@
+import asyncio
+import json
+import sqlite3
+from logger import logger
+from config import config
+
+
+class PersistentDict(dict):
+    """Dict that reports every change to its StateStore, so it is written to disk (debounced)."""
+
+    def __init__(self, store, namespace, data):
+        super().__init__(data)
+        self.store = store
+        self.namespace = namespace
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.store.mark_dirty(self.namespace, key)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.store.mark_dirty(self.namespace, key)
+
+    def pop(self, key, *default):
+        value = super().pop(key, *default)
+        self.store.mark_dirty(self.namespace, key)
+        return value
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        for key in list(self):
+            del self[key]
+
+
+class StateStore:
+    """Persists the monitor state in a small SQLite database with debounced writes."""
+
+    def __init__(self, path):
+        self.path = path
+        self.mappings = {}  # namespace -> PersistentDict
+        self.dirty = set()  # (namespace, key) mit ungespeicherten Änderungen
+        self.flush_task = None
+        self.lock = asyncio.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS state (namespace TEXT, key TEXT, value TEXT, PRIMARY KEY (namespace, key))")
+        self.connection.commit()
+
+    def mapping(self, namespace):
+        """Returns the persistent dict of a namespace, loaded from disk on first access."""
+        if namespace not in self.mappings:
+            rows = self.connection.execute("SELECT key, value FROM state WHERE namespace = ?", (namespace,))
+            data = {json.loads(key): json.loads(value) for key, value in rows}
+            self.mappings[namespace] = PersistentDict(self, namespace, data)
+            if data:
+                logger.info(f"💾 Loaded {len(data)} entries for {namespace} from {self.path}")
+        return self.mappings[namespace]
+
+    def mark_dirty(self, namespace, key):
+        """Remembers a changed entry and schedules a write after `state_flush_delay` seconds."""
+        self.dirty.add((namespace, key))
+        if self.flush_task is None:
+            try:
+                self.flush_task = asyncio.get_running_loop().create_task(self.flush_later())
+            except RuntimeError:
+                self.write_dirty()  # Kein Event-Loop (z.B. beim Start): sofort schreiben
+
+    async def flush_later(self):
+        """Waits for the debounce delay and writes all changes collected so far."""
+        try:
+            await asyncio.sleep(config.get("state_flush_delay", 5))
+            # Ein laufender Schreibvorgang wird auch beim Abbrechen (close) zu Ende geführt
+            await asyncio.shield(self.flush())
+        finally:
+            self.flush_task = None
+
+        if self.dirty:
+            # Während des Schreibens geänderte Einträge im nächsten Durchgang speichern
+            self.flush_task = asyncio.create_task(self.flush_later())
+
+    async def flush(self):
+        """Writes all dirty entries in a worker thread, one write at a time."""
+        async with self.lock:
+            changes = self.collect_dirty()
+            await asyncio.to_thread(self.write, *changes)
+
+    def collect_dirty(self):
+        """Takes the dirty entries and returns them as (upserts, deletes) rows."""
+        dirty, self.dirty = self.dirty, set()
+        upserts = []
+        deletes = []
+        for namespace, key in dirty:
+            mapping = self.mappings[namespace]
+            if key in mapping:
+                upserts.append((namespace, json.dumps(key), json.dumps(mapping[key])))
+            else:
+                deletes.append((namespace, json.dumps(key)))
+        return upserts, deletes
+
+    def write(self, upserts, deletes):
+        """Writes the given rows in one transaction."""
+        if not upserts and not deletes:
+            return
+        try:
+            with self.connection:
+                self.connection.executemany("INSERT OR REPLACE INTO state VALUES (?, ?, ?)", upserts)
+                self.connection.executemany("DELETE FROM state WHERE namespace = ? AND key = ?", deletes)
+            logger.debug(f"💾 Saved {len(upserts)} changed and {len(deletes)} removed state entries.")
+        except sqlite3.Error as e:
+            # Beim nächsten Mal erneut versuchen
+            self.dirty |= {(namespace, json.loads(key)) for namespace, key, *_ in upserts + deletes}
+            logger.error(f"❌ Error saving state to {self.path}: {e}")
+
+    def write_dirty(self):
+        """Writes all dirty entries synchronously."""
+        self.write(*self.collect_dirty())
+
+    async def close(self):
+        """Writes pending changes and closes the database, waiting for a write that is still running."""
+        if self.flush_task:
+            self.flush_task.cancel()
+            self.flush_task = None
+        async with self.lock:
+            self.write_dirty()
+            self.connection.close()
+
+# Create a global instance
+state_store = StateStore(config.get("state_file", "state.db"))
@@ -0,0 +1,149 @@
+"""Runs the Wings websocket listener against an in-process fake panel and Wings websocket."""
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from aiohttp import web
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Die Bot-Module lesen config.json und locales/ beim Import aus dem Arbeitsverzeichnis
+WORKDIR = tempfile.mkdtemp(prefix="plsnerfbot-test-")
+shutil.copytree(os.path.join(REPO_DIR, "locales"), os.path.join(WORKDIR, "locales"))
+with open(os.path.join(WORKDIR, "config.json"), "w") as config_file:
+    json.dump({"status_mode": "push", "servers": {"Lobby": "abc"},
+               "state_file": os.path.join(WORKDIR, "state.db")}, config_file)
+
+sys.path.insert(0, REPO_DIR)
+previous_cwd = os.getcwd()
+os.chdir(WORKDIR)
+try:
+    from pterodactyl_api import pterodactyl_api
+    from server_monitor import server_monitor
+    from state_store import state_store
+finally:
+    os.chdir(previous_cwd)
+
+
+class FakeWings:
+    """Serves /websocket credentials and a Wings console websocket with a scripted event sequence.
+
+    First connection: auth success, status "running", token expiring (expects a re-auth), status "offline", close.
+    Later connections are authenticated but never confirmed, so the server stays disconnected.
+    With `reject_tokens`, every connection is answered with "jwt error" instead.
+    """
+
+    def __init__(self, reject_tokens=False):
+        self.reject_tokens = reject_tokens
+        self.tokens_issued = 0
+        self.auths = []  # Empfangene Tokens in Reihenfolge
+        self.connections = 0
+        self.reconnected = asyncio.Event()
+        self.runner = None
+        self.url = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/api/client/servers/{server_id}/websocket", self.handle_credentials)
+        app.router.add_get("/ws/{server_id}", self.handle_websocket)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, "127.0.0.1", 0).start()
+        port = self.runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{port}"
+        return self.url
+
+    async def handle_credentials(self, request):
+        self.tokens_issued += 1
+        server_id = request.match_info["server_id"]
+        return web.json_response({"data": {"socket": self.url.replace("http", "ws") + f"/ws/{server_id}",
+                                           "token": f"token-{self.tokens_issued}"}})
+
+    async def receive_auth(self, ws):
+        message = await ws.receive_json()
+        assert message["event"] == "auth"
+        self.auths.append(message["args"][0])
+
+    async def handle_websocket(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections += 1
+
+        await self.receive_auth(ws)
+        if self.reject_tokens:
+            await ws.send_json({"event": "jwt error", "args": ["invalid token"]})
+            await ws.receive()  # Der Client schließt die Verbindung
+            return ws
+        if self.connections > 1:
+            self.reconnected.set()
+            await ws.receive()  # Offen halten, bis der Client schließt
+            return ws
+
+        await ws.send_json({"event": "auth success"})
+        await ws.send_json({"event": "status", "args": ["running"]})
+        await ws.send_json({"event": "token expiring"})
+        await self.receive_auth(ws)
+        await ws.send_json({"event": "status", "args": ["offline"]})
+        await ws.close()
+        return ws
+
+
+class WingsListenerTest(unittest.IsolatedAsyncioTestCase):
+
+    async def start_wings(self, **kwargs):
+        self.wings = FakeWings(**kwargs)
+        pterodactyl_api.api_url = await self.wings.start()
+
+    async def asyncSetUp(self):
+        self.wings = None
+        self.received = []  # (status, verbunden während des Events)
+
+        async def on_status(server_name, server_id, status):
+            self.received.append((status, server_monitor.listener.is_connected(server_id)))
+            await server_monitor.handle_status(server_name, server_id, status)
+
+        server_monitor.listener.on_status = on_status
+
+    async def asyncTearDown(self):
+        await server_monitor.listener.close()
+        await pterodactyl_api.close()
+        if self.wings:
+            await self.wings.runner.cleanup()
+
+    async def test_status_events_reach_monitor_and_polling_takes_over(self):
+        await self.start_wings()
+        server_monitor.listener.sync({"Lobby": "abc"})
+        await asyncio.wait_for(self.wings.reconnected.wait(), timeout=10)
+
+        # Authentifizierung und Token-Erneuerung mit frisch geholten Zugangsdaten
+        self.assertEqual(self.wings.auths, ["token-1", "token-2", "token-3"])
+
+        # Status-Events gehen in den Änderungspfad des Monitors
+        self.assertEqual(self.received, [("running", True), ("offline", True)])
+        self.assertEqual(server_monitor.desired_status["abc"], "offline")
+        self.assertEqual(pterodactyl_api.cache.peek("abc"), "offline")
+
+        # Nach dem Verbindungsabbruch (neue Verbindung noch nicht bestätigt) wird der Server wieder gepollt
+        self.assertFalse(server_monitor.listener.is_connected("abc"))
+
+    async def test_rejected_token_backs_off(self):
+        await self.start_wings(reject_tokens=True)
+        server_monitor.listener.sync({"Lobby": "abc"})
+
+        # Verbindungen nach 0 s, 1 s, 3 s, ... – ohne Backoff wären es nach 2,5 s schon drei
+        await asyncio.sleep(2.5)
+        self.assertEqual(self.wings.connections, 2)
+        self.assertEqual(self.wings.tokens_issued, 2)
+        self.assertFalse(server_monitor.listener.is_connected("abc"))
+
+
+def tearDownModule():
+    asyncio.run(state_store.close())
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Bounded LRU store of the last known values with request coalescing and negative caching.
+
+    Every lookup fetches (the poll scheduler decides when a server is due), but concurrent lookups of the same
+    key share one request and a failed fetch is remembered for `error_ttl` seconds.
+    """
+
+    def __init__(self, max_size, error_ttl=0):
+        """
+        :param max_size: Maximum number of entries before the least recently used one is evicted
+        :param error_ttl: Seconds a failed fetch is remembered before the source is asked again
+        """
+        self.max_size = max_size
+        self.error_ttl = error_ttl
+        self.entries = OrderedDict()  # key -> (value, stored_at, error)
+        self.in_flight = {}  # key -> laufender Fetch-Task
+        self.stats = {"misses": 0, "coalesced": 0, "negative_hits": 0, "evictions": 0}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def set(self, key, value, error=None):
+        """Stores a value (or a failed fetch, keeping the last good value) and evicts the oldest entries."""
+        if error is not None and key in self.entries:
+            value = self.entries[key][0]
+        self.entries[key] = (value, time.monotonic(), error)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def peek(self, key, default=None):
+        """Returns the last good value for a key without touching statistics."""
+        entry = self.entries.get(key)
+        return entry[0] if entry and entry[0] is not None else default
+
+    def discard(self, keys):
+        """Removes the given keys, e.g. servers that are no longer configured."""
+        for key in keys:
+            self.entries.pop(key, None)
+
+    async def get(self, key, fetch):
+        """Fetches the value for a key with the coroutine function `fetch`, joining a fetch already in flight.
+
+        :raises: The exception of a failed fetch, also while it is negatively cached
+        """
+        entry = self.entries.get(key)
+        if entry and entry[2] is not None and time.monotonic() - entry[1] < self.error_ttl:
+            self.stats["negative_hits"] += 1
+            raise entry[2]
+
+        task = self.in_flight.get(key)
+        if task is None:
+            self.stats["misses"] += 1
+            task = self.in_flight[key] = asyncio.create_task(self.run_fetch(key, fetch))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())  # Fehler auch bei abgebrochenen Aufrufern als abgerufen markieren
+        else:
+            self.stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    async def run_fetch(self, key, fetch):
+        """Runs a fetch and stores its result or error."""
+        try:
+            value = await fetch()
+        except Exception as e:
+            self.set(key, None, error=e)
+            raise
+        else:
+            self.set(key, value)
+            return value
+        finally:
+            self.in_flight.pop(key, None)
@@ -0,0 +1,115 @@
+import asyncio
+import json
+import aiohttp
+from logger import logger
+from config import config
+from pterodactyl_api import pterodactyl_api
+
+
+class WingsListener:
+    """Subscribes to the Wings console websocket of each server and forwards `status` events."""
+
+    def __init__(self, on_status):
+        """
+        :param on_status: Coroutine function called as on_status(server_name, server_id, status)
+        """
+        self.on_status = on_status
+        self.tasks = {}  # server_id -> Listener-Task
+        self.connected = set()  # server_ids mit authentifizierter Verbindung
+        self.session = None
+
+    def get_session(self):
+        """Returns a dedicated session for long-lived websocket connections (no total timeout)."""
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=None, connect=config.get("api_timeout", 10)))
+        return self.session
+
+    def is_connected(self, server_id):
+        """Returns True while status events for this server arrive via websocket."""
+        return server_id in self.connected
+
+    def sync(self, servers):
+        """Starts listeners for new servers and stops listeners for removed ones."""
+        wanted = {server_id: server_name for server_name, server_id in servers.items()}
+
+        for server_id in set(self.tasks) - set(wanted):
+            self.tasks.pop(server_id).cancel()
+            self.connected.discard(server_id)
+
+        for server_id, server_name in wanted.items():
+            if server_id not in self.tasks:
+                self.tasks[server_id] = asyncio.create_task(self.listen(server_name, server_id))
+
+    async def close(self):
+        """Stops all listeners and closes the websocket session."""
+        for task in self.tasks.values():
+            task.cancel()
+        self.tasks.clear()
+        self.connected.clear()
+        if self.session and not self.session.closed:
+            await self.session.close()
+
+    async def listen(self, server_name, server_id):
+        """Keeps a websocket connection to a server open, reconnecting with backoff on errors."""
+        reconnect_delay = 1
+        max_delay = config.get("websocket_max_reconnect_delay", 60)
+
+        while True:
+            try:
+                # Nur nach erfolgreicher Authentifizierung von vorn beginnen, sonst (z.B. "jwt error") weiter verdoppeln
+                if await self.run_connection(server_name, server_id):
+                    reconnect_delay = 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Websocket for {server_name} disconnected: {e!r}")
+            finally:
+                self.connected.discard(server_id)
+
+            # Bis zur Wiederverbindung übernimmt das Polling diesen Server
+            await asyncio.sleep(reconnect_delay)
+            reconnect_delay = min(max_delay, reconnect_delay * 2)
+
+    async def run_connection(self, server_name, server_id):
+        """Runs a single websocket session: authenticate, forward status events, renew the token.
+
+        Returns True if the session was authenticated ("auth success") before it ended.
+        """
+        authenticated = False
+        client, panel_server_id = pterodactyl_api.get_client(server_id)
+        socket_url, token = await client.get_websocket_credentials(panel_server_id)
+
+        async with self.get_session().ws_connect(
+                socket_url, headers={"Origin": client.api_url}, heartbeat=30) as ws:
+            await ws.send_json({"event": "auth", "args": [token]})
+
+            async for msg in ws:
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    return authenticated
+
+                data = json.loads(msg.data)
+                event = data.get("event")
+                args = data.get("args") or []
+
+                if event == "auth success":
+                    authenticated = True
+                    self.connected.add(server_id)
+                    logger.info(f"🔌 Websocket connected for {server_name}")
+                elif event == "status" and args:
+                    await self.on_status(server_name, server_id, args[0])
+                elif event == "stats" and args:
+                    # Gleiche Messwerte wie /resources, nur das Netzwerk ist verschachtelt
+                    stats = json.loads(args[0])
+                    network = stats.get("network") or {}
+                    stats["network_rx_bytes"] = network.get("rx_bytes")
+                    stats["network_tx_bytes"] = network.get("tx_bytes")
+                    pterodactyl_api.resource_history.record(server_id, stats)
+                elif event == "token expiring":
+                    _, token = await client.get_websocket_credentials(panel_server_id)
+                    await ws.send_json({"event": "auth", "args": [token]})
+                elif event in ("token expired", "jwt error"):
+                    logger.warning(f"⚠️ Websocket token for {server_name} rejected ({event}), reconnecting...")
+                    return authenticated
+
+        return authenticated